@@ -1,39 +1,216 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import gc
+import hashlib
 import json
+import time
+from typing import Callable, Iterator
 from llama_cpp import Llama
 
 from data.config import settings
 
+class PromptPrefixCache:
+    """依 system prompt 保存 llama.cpp 狀態 (含 KV cache) 的 LRU，總大小不超過 capacity_bytes"""
+    def __init__(self, capacity_bytes: int):
+        self.capacity_bytes = capacity_bytes
+        self._states: OrderedDict = OrderedDict()  # system prompt 雜湊 -> LlamaState
+        self._size = 0
+
+    def get(self, key: str):
+        state = self._states.get(key)
+        if state is not None:
+            self._states.move_to_end(key)
+        return state
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._states
+
+    def put(self, key: str, state):
+        size = state.llama_state_size
+        if size > self.capacity_bytes:
+            return
+        old = self._states.pop(key, None)
+        if old is not None:
+            self._size -= old.llama_state_size
+        self._states[key] = state
+        self._size += size
+        while self._size > self.capacity_bytes:
+            _, evicted = self._states.popitem(last=False)
+            self._size -= evicted.llama_state_size
+
+    def stats(self) -> dict:
+        return {"entries": len(self._states), "size_mb": round(self._size / 1024 / 1024, 1),
+                "capacity_mb": round(self.capacity_bytes / 1024 / 1024, 1)}
+
 class FinanceAdvisorLLM:
-    def __init__(self, model_path: str, n_threads: int = 8):
+    def __init__(self, model_path: str, n_threads: int = 8, n_ctx: int | None = None,
+                 prefix_cache_mb: float | None = None):
         """
         初始化 LLM
         :param model_path: GGUF 模型路徑
         :param n_threads: CPU 核心數
+        :param n_ctx: 上下文長度（None 時使用 settings.n_ctx）
+        :param prefix_cache_mb: system prompt 前綴狀態快取的容量（None 時使用 settings.llm_prefix_cache_mb，0 表示停用）
         """
+        self.model_path = model_path
         self.llm = Llama(
             model_path=model_path,
-            n_ctx=settings.n_ctx,          # 
+            n_ctx=settings.n_ctx if n_ctx is None else n_ctx,
             n_threads=n_threads, # 建議設為實體核心數
             verbose=False
         )
+        capacity_mb = settings.llm_prefix_cache_mb if prefix_cache_mb is None else prefix_cache_mb
+        self.prefix_cache = PromptPrefixCache(int(capacity_mb * 1024 * 1024)) if capacity_mb > 0 else None
+        self._context_key = None  # 目前 context 內容所對應的 system prompt
+        self.last_stats: dict = {}
 
     def generate_advice(self, analysis_report: dict,system_prompt:str) -> str:
         """
-        根據分析報告生成建議
+        根據分析報告生成建議 (前綴命中等統計存於 self.last_stats)
         """
-        # 建立簡潔、指令導向的 Prompt
-        prompt = self._build_prompt(analysis_report)
-        
-        response = self.llm.create_chat_completion(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=settings.temperature,  # 保持一致性
-            max_tokens=settings.max_tokens
-        )
+        key, status = self._restore_prefix(system_prompt)
+        with self._count_evals() as counts:
+            response = self.llm.create_chat_completion(
+                messages=self._build_messages(analysis_report, system_prompt),
+                temperature=settings.temperature,  # 保持一致性
+                max_tokens=settings.max_tokens
+            )
+        self.last_stats = self._record_prefix(key, status, counts, response.get("usage"))
         return response["choices"][0]["message"]["content"]
 
+    def _restore_prefix(self, system_prompt: str):
+        """
+        推論前準備 system prompt 前綴：
+        context 中已是相同 prompt 時直接沿用 (warm)，否則載入先前保存的狀態 (hit)
+        llama.cpp 會自動略過與目前 context 相同的前綴 token，只評估報告部分
+        回傳 (快取鍵, 狀態)
+        """
+        key = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+        if self.prefix_cache is None:
+            status = "off"
+        elif self._context_key == key:
+            status = "warm"
+        else:
+            state = self.prefix_cache.get(key)
+            if state is not None:
+                self.llm.load_state(state)
+                status = "hit"
+            else:
+                status = "miss"
+        self._context_key = None  # 推論中途中止時 context 內容不確定，待完成後再記錄
+        return key, status
+
+    @contextmanager
+    def _count_evals(self):
+        """
+        推論期間記錄 llama.cpp 實際評估的 token 數：
+        第一次 eval 為 prompt 中未命中前綴的部分（此時 n_tokens 即沿用的前綴長度），之後每次 eval 為一個生成的 token
+        """
+        counts = {"reused": 0, "prompt": None, "generated": 0}
+        evaluate = self.llm.eval
+
+        def counting_eval(tokens):
+            if counts["prompt"] is None:
+                counts["reused"] = self.llm.n_tokens
+                counts["prompt"] = len(tokens)
+            else:
+                counts["generated"] += len(tokens)
+            return evaluate(tokens)
+
+        self.llm.eval = counting_eval
+        try:
+            yield counts
+        finally:
+            del self.llm.eval  # 移除實例屬性，恢復 Llama.eval
+
+    def _record_prefix(self, key: str, status: str, counts: dict, usage: dict | None = None) -> dict:
+        """推論後整理 token 統計，並在首次遇到此 system prompt 時保存狀態
+
+        prompt/completion token 數優先取自 llama.cpp 的 usage（串流模式沒有 usage，改用實際 eval 的 token 數；
+        最後取樣的 token 不會再被 eval，因此生成數加 1）
+        """
+        if usage:
+            prompt_tokens, completion_tokens = usage["prompt_tokens"], usage["completion_tokens"]
+        elif counts["prompt"] is not None:
+            prompt_tokens, completion_tokens = counts["reused"] + counts["prompt"], counts["generated"] + 1
+        else:
+            prompt_tokens, completion_tokens = 0, 0
+        self._context_key = key
+        if self.prefix_cache is not None and key not in self.prefix_cache:
+            self.prefix_cache.put(key, self.llm.save_state())
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "prefix_hit_tokens": counts["reused"],
+            "prefix_cache": status,
+        }
+
+    def stream_advice(self, analysis_report: dict, system_prompt: str,
+                      should_stop: Callable[[], bool] | None = None) -> Iterator[tuple[str, dict]]:
+        """
+        逐 token 產生建議，產生 (事件名稱, 資料) :
+        ("token", {"text": ...}) 數次，最後一個為 ("done", {"stats": {...}})
+        :param should_stop: 每個 token 之間檢查，回傳 True 時中止生成（例如用戶端已斷線）
+        """
+        started = time.perf_counter()
+        first_token_at = None
+        finish_reason = None
+        cancelled = False
+
+        key, status = self._restore_prefix(system_prompt)
+        with self._count_evals() as counts:
+            chunks = self.llm.create_chat_completion(
+                messages=self._build_messages(analysis_report, system_prompt),
+                temperature=settings.temperature,
+                max_tokens=settings.max_tokens,
+                stream=True
+            )
+            try:
+                for chunk in chunks:
+                    if should_stop and should_stop():
+                        cancelled = True
+                        break
+                    choice = chunk["choices"][0]
+                    finish_reason = choice.get("finish_reason") or finish_reason
+                    text = choice.get("delta", {}).get("content")
+                    if not text:
+                        continue
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield "token", {"text": text}
+            finally:
+                # 關閉產生器即停止 llama.cpp 繼續解碼
+                if hasattr(chunks, "close"):
+                    chunks.close()
+
+        elapsed = time.perf_counter() - started
+        decode_time = elapsed - (first_token_at - started) if first_token_at else 0.0
+        self.last_stats = self._record_prefix(key, status, counts)
+        tokens = self.last_stats["completion_tokens"]
+        yield "done", {"stats": {
+            **self.last_stats,
+            "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+            "total_ms": round(elapsed * 1000, 1),
+            "tokens_per_second": round(tokens / decode_time, 2) if decode_time > 0 else None,
+            "finish_reason": "cancelled" if cancelled else finish_reason,
+        }}
+
+    def _build_messages(self, report: dict, system_prompt: str) -> list[dict]:
+        # 建立簡潔、指令導向的 Prompt
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": self._build_prompt(report)}
+        ]
+
+    def close(self):
+        """釋放模型佔用的記憶體（由模型池卸載時呼叫）"""
+        self.prefix_cache = None
+        llm, self.llm = self.llm, None
+        if llm is not None and hasattr(llm, "close"):
+            llm.close()
+        del llm
+        gc.collect()
+
     def _build_prompt(self, report: dict) -> str:
         """
         格式化數據摘要為 Prompt
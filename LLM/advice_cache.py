@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class AdviceCache:
+    """以 SQLite 檔案保存的 AI 建議快取（執行緒安全，重啟後仍有效）
+
+    鍵為 (統計報告, system prompt, 模型路徑, 取樣參數) 的 SHA-256；
+    報告內容取決於帳本資料，帳本改變後報告不同，舊建議自然不會再被命中。
+    超過筆數上限時淘汰最久未使用者。
+    """
+    def __init__(self, path: str, max_entries: int = 256):
+        """
+        Args:
+            path: SQLite 檔案路徑
+            max_entries: 最多保留的建議數（0 表示停用快取）
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        if self.max_entries > 0:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS advice_cache ("
+                    " key TEXT PRIMARY KEY,"
+                    " advice TEXT NOT NULL,"
+                    " meta TEXT,"
+                    " created_at REAL NOT NULL,"
+                    " last_used REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_advice_cache_last_used ON advice_cache (last_used)")
+
+    @contextmanager
+    def _connect(self):
+        """開啟連線並在一個交易內執行，結束後關閉"""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(report: dict, system_prompt: str, model_path: str, sampling: dict) -> str:
+        """依報告、system prompt、模型與取樣參數計算快取鍵"""
+        payload = json.dumps(
+            {"report": report, "system_prompt": system_prompt, "model_path": model_path, "sampling": sampling},
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> dict | None:
+        """取得快取的建議 {"advice", "meta", "created_at"}；不存在時回傳 None"""
+        if self.max_entries <= 0:
+            return None
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT advice, meta, created_at FROM advice_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            conn.execute("UPDATE advice_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._hits += 1
+        advice, meta, created_at = row
+        return {"advice": advice, "meta": json.loads(meta) if meta else {}, "created_at": created_at}
+
+    def put(self, key: str, advice: str, meta: dict | None = None):
+        """寫入建議並淘汰超出上限的項目"""
+        if self.max_entries <= 0:
+            return
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO advice_cache (key, advice, meta, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, advice, json.dumps(meta or {}, ensure_ascii=False), now, now)
+            )
+            evicted = conn.execute(
+                "DELETE FROM advice_cache WHERE key IN ("
+                " SELECT key FROM advice_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            self._evictions += evicted
+
+    def clear(self) -> int:
+        """清除所有建議，回傳刪除筆數"""
+        if self.max_entries <= 0:
+            return 0
+        with self._lock, self._connect() as conn:
+            return conn.execute("DELETE FROM advice_cache").rowcount
+
+    def stats(self) -> dict:
+        """命中/未命中統計"""
+        entries = 0
+        if self.max_entries > 0:
+            with self._lock, self._connect() as conn:
+                entries = conn.execute("SELECT COUNT(*) FROM advice_cache").fetchone()[0]
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
@@ -1,62 +1,184 @@
-import pandas as pd
 from datetime import datetime
-from dataBase.FinanceDB import FinanceService, Direction,FinanceDB
+import numpy as np
+from dataBase.FinanceDB import FinanceService, Direction,FinanceDB, DIRECTION_CODES
+from LLM.anomaly import detect_anomalies
 
 class FinanceAnalysisEngine:
-    def __init__(self, service: FinanceService):
+    def __init__(self,
+        service: FinanceService,
+        anomaly_method: str = "mad",
+        anomaly_threshold: float = 3.5,
+        anomaly_min_samples: int = 5,
+        anomaly_max_results: int | None = 20
+    ):
+        """
+        Args:
+            service: FinanceService
+            anomaly_method: 異常偵測方法，"mad"（中位數/MAD）或 "zscore"
+            anomaly_threshold: 異常分數門檻
+            anomaly_min_samples: 類別使用自身基準所需的最少筆數
+            anomaly_max_results: 最多回報的異常筆數
+        """
         self.service = service
+        self.anomaly_options = {
+            "method": anomaly_method,
+            "threshold": anomaly_threshold,
+            "min_samples": anomaly_min_samples,
+            "max_results": anomaly_max_results,
+        }
 
     def get_structured_report(self, start_date=None, end_date=None):
         """
         生成詳盡的財務統計報告摘要
+        (結果依 (區間, 帳本版本) 快取，帳本寫入後自動失效)
         """
-        # 1. 獲取原始數據
-        raw_logs = self.service.get_filtered_and_sorted_logs(
-            start_date=start_date, 
-            end_date=end_date
+        key = (
+            "structured_report", start_date, end_date,
+            tuple(sorted(self.anomaly_options.items())),
+            self.service.db.ledger_version
         )
-        
-        if not raw_logs:
-            return {"status": "no_data"}
+        return self.service.report_cache.get_or_compute(key, lambda: self._build_report(start_date, end_date))
 
-        # 轉換為 DataFrame 進行高效運算
-        df = pd.DataFrame(raw_logs)
-        df['timestamp'] = pd.to_datetime(df['timestamp'] ,format='ISO8601')
+    def get_comparison_report(self, periods):
+        """
+        多區間比較報告：每個區間的指標同 get_structured_report，並附上與前一區間的差異
+        (所有區間共用一次快照切片，結果依 (區間清單, 帳本版本) 快取)
 
-        # 2. 核心指標計算
-        income_df = df[df['actual_type'] == Direction.Income.value]
-        expense_df = df[df['actual_type'] == Direction.Expenditure.value]
+        Args:
+            periods: (開始時間, 結束時間) 清單，依時間先後排列
+        """
+        key = (
+            "comparison_report", tuple(periods),
+            tuple(sorted(self.anomaly_options.items())),
+            self.service.db.ledger_version
+        )
+        return self.service.report_cache.get_or_compute(key, lambda: self._build_comparison(periods))
+
+    def _build_comparison(self, periods):
+        view = self.service.get_ledger_view(min(s for s, _ in periods), max(e for _, e in periods))
+        items = []
+        previous = None
+        for report in self._build_reports(view, periods):
+            values = self._metric_values(report)
+            report["delta"] = self._metric_deltas(previous, values) if previous is not None else None
+            items.append(report)
+            previous = values
+        return {"periods": items}
+
+    @staticmethod
+    def _metric_values(report):
+        """取出可比較的數值指標（無資料的區間視為 0）"""
+        metrics = report.get("metrics", {})
+        income = metrics.get("total_income", 0.0)
+        net = metrics.get("net_savings", 0.0)
+        return {
+            "total_income": income,
+            "total_expense": metrics.get("total_expense", 0.0),
+            "net_savings": net,
+            "savings_rate": (net / income) if income > 0 else 0.0,
+        }
+
+    @staticmethod
+    def _metric_deltas(previous, current):
+        """與前一區間的差異；儲蓄率以百分點表示"""
+        deltas = {}
+        for name in ("total_income", "total_expense", "net_savings"):
+            change = current[name] - previous[name]
+            deltas[name] = {
+                "change": round(change, 2),
+                "change_pct": round(change / abs(previous[name]) * 100, 1) if previous[name] else None
+            }
+        deltas["savings_rate"] = {"change_pp": round((current["savings_rate"] - previous["savings_rate"]) * 100, 1)}
+        return deltas
+
+    @staticmethod
+    def _period_info(start_date, end_date):
+        return {
+            "start": start_date.isoformat() if start_date else "Origin",
+            "end": end_date.isoformat() if end_date else "Now"
+        }
+
+    def _build_report(self, start_date=None, end_date=None):
+        """
+        計算報告內容
+        (合計、分組、平均、頻次皆以欄式快照的時間切片向量化計算，只有異常交易會取回原始資料列)
+        """
+        view = self.service.get_ledger_view(start_date, end_date)
+        return self._build_reports(view, [(start_date, end_date)])[0]
+
+    def _build_reports(self, view, periods):
+        """在同一個快照切片上計算多個區間的報告，各區間的異常交易明細合併為一次查詢"""
+        names = {c["id"]: c["name"] for c in self.service.get_all_categories()}
+        results = [self._summarize_view(view.between(s, e), s, e, names) for s, e in periods]
+
+        score_by_id = {}
+        for _, anomaly_scores in results:
+            score_by_id.update(anomaly_scores)
+        rows = {l["id"]: l for l in self.service.get_logs_by_ids(list(score_by_id))}
+
+        reports = []
+        for report, anomaly_scores in results:
+            if "anomalies" in report:
+                report["anomalies"] = [
+                    {"category": rows[i]["category"], "amount": rows[i]["amount"], "note": rows[i]["note"], "score": round(score, 2)}
+                    for i, score in anomaly_scores.items()
+                    if i in rows
+                ]
+            reports.append(report)
+        return reports
 
-        total_income = income_df['amount'].sum()
-        total_expense = expense_df['amount'].sum()
+    def _summarize_view(self, view, start_date, end_date, names):
+        """計算單一區間的報告，回傳 (報告, {異常交易 id: 分數})；異常明細由 _build_reports 填入"""
+        if view.size == 0:
+            return {"status": "no_data", "period": self._period_info(start_date, end_date)}, {}
+
+        # 1. 依交易方向切分
+        is_expense = view.directions == DIRECTION_CODES[Direction.Expenditure]
+        is_income = view.directions == DIRECTION_CODES[Direction.Income]
+        expense_amounts = view.amounts[is_expense]
+        expense_categories = view.category_ids[is_expense]
+
+        # 2. 核心指標計算
+        total_income = float(view.amounts[is_income].sum())
+        total_expense = float(expense_amounts.sum())
         net_savings = total_income - total_expense
         savings_rate = (net_savings / total_income) if total_income > 0 else 0
 
-        # 3. 支出深度分析
+        # 3. 支出深度分析 (依類別分組合計與筆數)
+        codes, inverse, counts = np.unique(expense_categories, return_inverse=True, return_counts=True)
+        totals = np.bincount(inverse, weights=expense_amounts, minlength=codes.size)
+        expense_by_category = sorted(
+            (
+                {"category": names[int(code)], "total": float(total), "count": int(count)}
+                for code, total, count in zip(codes, totals, counts)
+                if int(code) in names
+            ),
+            key=lambda r: r["category"]
+        )
+
         # A. 分類統計與佔比
-        cat_summary = expense_df.groupby('category')['amount'].sum().sort_values(ascending=False)
+        cat_summary = sorted(expense_by_category, key=lambda r: r["total"], reverse=True)
         cat_analysis = [
             {
-                "category": cat,
-                "amount": amt,
-                "percentage": f"{(amt / total_expense * 100):.1f}%"
+                "category": r["category"],
+                "amount": r["total"],
+                "percentage": f"{(r['total'] / total_expense * 100):.1f}%"
             }
-            for cat, amt in cat_summary.items()
+            for r in cat_summary
         ]
 
-        # B. 異常支出偵測 (單筆金額大於支出平均值 2 倍)
-        avg_expense = expense_df['amount'].mean()
-        anomalies = expense_df[expense_df['amount'] > avg_expense * 2][['category', 'amount', 'note']].to_dict('records')
+        # B. 異常支出偵測 (各類別以自身的中位數/MAD 為基準，依分數排序)
+        avg_expense = float(expense_amounts.mean()) if expense_amounts.size else 0.0
+        indices, scores = detect_anomalies(expense_categories, expense_amounts, **self.anomaly_options)
+        anomaly_scores = dict(zip(view.ids[is_expense][indices].tolist(), scores.tolist()))
 
         # C. 頻次分析 (找出最常消費的項目)
-        frequency = expense_df['category'].value_counts().head(3).to_dict()
+        frequent = sorted(expense_by_category, key=lambda r: (-r["count"], r["category"]))[:3]
+        frequency = {r["category"]: r["count"] for r in frequent}
 
         # 4. 構建輸出結構 (供 LLM 使用)
         report = {
-            "period": {
-                "start": start_date.isoformat() if start_date else "Origin",
-                "end": end_date.isoformat() if end_date else "Now"
-            },
+            "period": self._period_info(start_date, end_date),
             "metrics": {
                 "total_income": round(total_income, 2),
                 "total_expense": round(total_expense, 2),
@@ -64,13 +186,11 @@ class FinanceAnalysisEngine:
                 "savings_rate": f"{savings_rate:.1%}"
             },
             "expenditure_structure": cat_analysis,
-            "anomalies": anomalies,
+            "anomalies": [],
             "consumption_behavior": {
                 "high_frequency_categories": frequency,
                 "average_transaction": round(avg_expense, 2)
             }
         }
         
-        return report
-    
-
+        return report, anomaly_scores
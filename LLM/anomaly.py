@@ -0,0 +1,97 @@
+import numpy as np
+
+# 常態分佈下 MAD 與標準差的換算係數 (Iglewicz & Hoaglin modified z-score)
+_MAD_SCALE = 0.6745
+# MAD 為 0 時改用平均絕對離差，換算係數為 sqrt(pi/2) 的倒數
+_MEAN_AD_SCALE = 0.7979
+
+DETECTION_METHODS = ("mad", "zscore")
+
+
+def _group_medians(codes: np.ndarray, values: np.ndarray, n_groups: int, order: np.ndarray) -> np.ndarray:
+    """求出每組中位數（order 為依 codes 穩定排序的索引，各組只做 O(n) 的 partition）"""
+    grouped = values[order]
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=n_groups))))
+    medians = np.full(n_groups, np.nan)
+    for g in range(n_groups):  # 組數為類別數，遠小於交易筆數
+        if bounds[g + 1] > bounds[g]:
+            medians[g] = np.median(grouped[bounds[g]:bounds[g + 1]])
+    return medians
+
+
+def _robust_scores(codes: np.ndarray, amounts: np.ndarray, n_groups: int) -> np.ndarray:
+    """每組以中位數/MAD 計算 modified z-score"""
+    order = np.argsort(codes, kind="stable")
+    median = _group_medians(codes, amounts, n_groups, order)
+    deviation = np.abs(amounts - median[codes])
+    mad = _group_medians(codes, deviation, n_groups, order)
+
+    counts = np.bincount(codes, minlength=n_groups)
+    mean_ad = np.bincount(codes, weights=deviation, minlength=n_groups) / np.maximum(counts, 1)
+
+    # 一半以上金額相同時 MAD 為 0，退回平均絕對離差
+    scale = np.where(mad > 0, mad / _MAD_SCALE, mean_ad / _MEAN_AD_SCALE)
+    spread = scale[codes]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(spread > 0, (amounts - median[codes]) / spread, 0.0)
+    return scores
+
+
+def _zscore_scores(codes: np.ndarray, amounts: np.ndarray, n_groups: int) -> np.ndarray:
+    """每組以平均數/標準差計算 z-score"""
+    counts = np.maximum(np.bincount(codes, minlength=n_groups), 1)
+    mean = np.bincount(codes, weights=amounts, minlength=n_groups) / counts
+    var = np.bincount(codes, weights=amounts * amounts, minlength=n_groups) / counts - mean ** 2
+    std = np.sqrt(np.maximum(var, 0.0))[codes]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(std > 0, (amounts - mean[codes]) / std, 0.0)
+
+
+def detect_anomalies(
+    category_ids: np.ndarray,
+    amounts: np.ndarray,
+    method: str = "mad",
+    threshold: float = 3.5,
+    min_samples: int = 5,
+    max_results: int | None = 20
+) -> tuple[np.ndarray, np.ndarray]:
+    """依類別基準找出金額異常偏高的交易（全為向量化運算）
+
+    每個類別以自己的中位數/MAD（或平均數/標準差）為基準；
+    筆數少於 min_samples 的類別改用全體資料的基準。
+
+    Args:
+        category_ids: 每筆交易的類別 ID（可含 -1 代表無類別）
+        amounts: 每筆交易金額
+        method: "mad"（中位數/MAD，預設）或 "zscore"
+        threshold: 分數超過此值視為異常
+        min_samples: 類別使用自身基準所需的最少筆數
+        max_results: 最多回傳筆數（None 表示全部）
+    Returns:
+        tuple: (異常交易在輸入陣列中的索引, 對應分數)，依分數由高到低排序
+    """
+    if method not in DETECTION_METHODS:
+        raise ValueError(f"不支援的異常偵測方法: {method}")
+    amounts = np.asarray(amounts, dtype=np.float64)
+    if amounts.size == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    # 類別 ID 轉為連續編碼，樣本不足的類別併入共用組 (編碼 0)
+    _, codes = np.unique(np.asarray(category_ids), return_inverse=True)
+    counts = np.bincount(codes)
+    small = counts[codes] < min_samples
+    codes = np.where(small, 0, codes + 1)
+    n_groups = int(codes.max()) + 1
+
+    score_fn = _robust_scores if method == "mad" else _zscore_scores
+    scores = score_fn(codes, amounts, n_groups)
+    if small.any():
+        # 樣本不足的交易以全體資料為基準重新評分
+        global_scores = score_fn(np.zeros(amounts.size, dtype=np.int64), amounts, 1)
+        scores = np.where(small, global_scores, scores)
+
+    flagged = np.flatnonzero(scores > threshold)
+    ranked = flagged[np.argsort(-scores[flagged], kind="stable")]
+    if max_results is not None:
+        ranked = ranked[:max_results]
+    return ranked, scores[ranked]
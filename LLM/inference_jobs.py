@@ -0,0 +1,187 @@
+from collections import OrderedDict, deque
+import threading
+import time
+import uuid
+from typing import Callable
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class QueueFullError(RuntimeError):
+    """等待中的工作數已達上限"""
+
+
+class InferenceJob:
+    def __init__(self, kind: str, params: dict | None = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.result = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.cancel_event = threading.Event()  # 執行中的工作在下一個 token 檢查此旗標
+        self.done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self, position: int | None = None) -> dict:
+        """工作狀態與耗時 (queue_ms: 排隊，run_ms: 執行，total_ms: 送出到結束)"""
+        def ms(start, end):
+            return round((end - start) * 1000, 1) if start is not None and end is not None else None
+        now = time.time()
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "queue_position": position,
+            "result": self.result,
+            "error": self.error,
+            "timing": {
+                "created_at": self.created_at,
+                "queue_ms": ms(self.created_at, self.started_at or self.finished_at or now),
+                "run_ms": ms(self.started_at, self.finished_at or (now if self.started_at else None)),
+                "total_ms": ms(self.created_at, self.finished_at),
+            },
+        }
+
+
+class InferenceJobQueue:
+    """LLM 推論工作佇列（執行緒安全）
+
+    所有工作由單一背景執行緒依序執行，模型同一時間只服務一個工作，API 事件迴圈不會被推論阻塞。
+    等待中的工作數超過 max_queue 時拒絕新工作；已結束的工作保留最近 max_history 筆供查詢。
+    """
+    def __init__(self, max_queue: int = 8, max_history: int = 100):
+        """
+        Args:
+            max_queue: 最多等待中的工作數（不含執行中者）
+            max_history: 保留的已結束工作數
+        """
+        self.max_queue = max_queue
+        self.max_history = max_history
+        self._jobs: OrderedDict[str, InferenceJob] = OrderedDict()
+        self._pending: deque[tuple[InferenceJob, Callable]] = deque()
+        self._cond = threading.Condition()
+        self._running: InferenceJob | None = None
+        self._closed = False
+        self._worker = threading.Thread(target=self._work_loop, name="llm-inference-worker", daemon=True)
+        self._worker.start()
+
+    def submit(self, run: Callable[[threading.Event], object], kind: str = "advice", params: dict | None = None) -> InferenceJob:
+        """
+        加入工作；run(cancel_event) 在背景執行緒執行，回傳值即工作結果
+        Raises:
+            QueueFullError: 等待中的工作數已達上限
+        """
+        job = InferenceJob(kind, params)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("工作佇列已關閉")
+            if len(self._pending) >= self.max_queue:
+                raise QueueFullError(f"等待中的工作已達上限 {self.max_queue}，請稍後再試")
+            self._jobs[job.id] = job
+            self._pending.append((job, run))
+            self._cond.notify()
+        return job
+
+    def add_finished(self, result, kind: str = "advice", params: dict | None = None) -> InferenceJob:
+        """登記一個不需推論即完成的工作（例如建議快取命中）"""
+        job = InferenceJob(kind, params)
+        job.started_at = job.finished_at = job.created_at
+        job.status = "succeeded"
+        job.result = result
+        job.done.set()
+        with self._cond:
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def get(self, job_id: str) -> InferenceJob | None:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def describe(self, job: InferenceJob) -> dict:
+        """工作狀態，排隊中的工作附上目前順位 (0 表示下一個執行)"""
+        with self._cond:
+            position = None
+            if job.status == "queued":
+                position = next((i for i, (j, _) in enumerate(self._pending) if j is job), None)
+            return job.to_dict(position)
+
+    def cancel(self, job_id: str) -> InferenceJob | None:
+        """取消工作：排隊中者直接移除，執行中者在下一個 token 停止；不存在時回傳 None"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return job
+            job.cancel_event.set()
+            if job.status == "queued":
+                self._pending = deque(item for item in self._pending if item[0] is not job)
+                self._finish(job, "cancelled")
+        return job
+
+    def stats(self) -> dict:
+        with self._cond:
+            counts = {status: 0 for status in JOB_STATUSES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {
+                "max_queue": self.max_queue,
+                "queue_depth": len(self._pending),
+                "running": self._running.id if self._running else None,
+                "jobs": counts,
+            }
+
+    def close(self):
+        """停止接受新工作並取消所有等待中的工作"""
+        with self._cond:
+            self._closed = True
+            while self._pending:
+                job, _ = self._pending.popleft()
+                job.cancel_event.set()
+                self._finish(job, "cancelled")
+            if self._running:
+                self._running.cancel_event.set()
+            self._cond.notify_all()
+
+    def _work_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                job, run = self._pending.popleft()
+                job.status = "running"
+                job.started_at = time.time()
+                self._running = job
+            try:
+                result = run(job.cancel_event)
+                status, error = ("cancelled" if job.cancel_event.is_set() else "succeeded"), None
+            except Exception as e:
+                result, status, error = None, "failed", str(e)
+            with self._cond:
+                job.result = result
+                job.error = error
+                self._running = None
+                self._finish(job, status)
+
+    def _finish(self, job: InferenceJob, status: str):
+        """標記工作結束（呼叫端需持有 self._cond）"""
+        job.status = status
+        job.finished_at = time.time()
+        job.done.set()
+        self._prune()
+
+    def _prune(self):
+        """只保留最近 max_history 筆已結束的工作（呼叫端需持有 self._cond）"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
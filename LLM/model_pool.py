@@ -0,0 +1,205 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import gc
+import os
+import threading
+import time
+from typing import Callable, NamedTuple
+
+
+class ModelKey(NamedTuple):
+    """模型池的鍵：相同檔案但不同 n_ctx / n_threads 視為不同的模型實例"""
+    model_path: str
+    n_ctx: int
+    n_threads: int
+
+
+class _PooledModel:
+    def __init__(self, model):
+        self.model = model
+        self.lock = threading.Lock()  # llama.cpp 模型不可同時推論，同一實例一次只給一個請求使用
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.uses = 0
+
+
+def _available_memory_mb() -> float | None:
+    """讀取 /proc/meminfo 的 MemAvailable；無法取得時回傳 None"""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _default_loader(key: ModelKey):
+    from LLM.advice import FinanceAdvisorLLM  # 延後載入 llama_cpp
+    return FinanceAdvisorLLM(model_path=key.model_path, n_threads=key.n_threads, n_ctx=key.n_ctx)
+
+
+def _default_unloader(model):
+    close = getattr(model, "close", None)
+    if close:
+        close()
+
+
+class ModelPool:
+    """常駐的 LLM 模型池（執行緒安全）
+
+    依 (model_path, n_ctx, n_threads) 保留已載入的模型供後續請求重用；
+    超過數量上限時淘汰最久未使用的閒置模型，閒置超過 idle_ttl 秒或可用記憶體不足時自動卸載。
+    設定中的模型路徑改變後，下一次 acquire 會以新鍵載入新模型，舊模型隨之被淘汰。
+    """
+    def __init__(self,
+        max_models: int = 1,
+        idle_ttl: float = 600.0,
+        min_free_memory_mb: float = 0.0,
+        loader: Callable[[ModelKey], object] | None = None,
+        unloader: Callable[[object], None] | None = None
+    ):
+        """
+        Args:
+            max_models: 同時保留的模型數
+            idle_ttl: 閒置多少秒後卸載（0 表示用完立即卸載）
+            min_free_memory_mb: 可用記憶體低於此值時卸載閒置模型；載入前也會預留模型檔大小加上此值（0 表示不檢查）
+            loader: 依 ModelKey 建立模型的函式（預設建立 FinanceAdvisorLLM）
+            unloader: 釋放模型資源的函式（預設呼叫 model.close()）
+        """
+        self.max_models = max(1, max_models)
+        self.idle_ttl = idle_ttl
+        self.min_free_memory_mb = min_free_memory_mb
+        self._loader = loader or _default_loader
+        self._unloader = unloader or _default_unloader
+        self._entries: OrderedDict[ModelKey, _PooledModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # 一次只載入一個模型，避免同時佔用兩份記憶體
+        self._loads = 0
+        self._hits = 0
+        self._evictions = 0
+        self._closed = threading.Event()
+        self._reaper = threading.Thread(target=self._reap_loop, name="llm-model-reaper", daemon=True)
+        self._reaper.start()
+
+    @contextmanager
+    def acquire(self, model_path: str, n_ctx: int, n_threads: int):
+        """取得模型（必要時載入），區塊結束前其他請求無法使用同一實例
+
+        用法: with pool.acquire(path, n_ctx, n_threads) as advisor: advisor.generate_advice(...)
+        """
+        key = ModelKey(model_path, int(n_ctx), int(n_threads))
+        entry = self._checkout(key)
+        try:
+            with entry.lock:
+                entry.uses += 1
+                yield entry.model
+        finally:
+            with self._lock:
+                entry.refs -= 1
+                entry.last_used = time.monotonic()
+            if self.idle_ttl <= 0:
+                self._evict_idle(lambda k, e: True)
+
+    def _checkout(self, key: ModelKey) -> _PooledModel:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.refs += 1
+                self._hits += 1
+                return entry
+
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:  # 等待期間已被其他請求載入
+                    self._entries.move_to_end(key)
+                    entry.refs += 1
+                    self._hits += 1
+                    return entry
+            self._make_room(key)
+            model = self._loader(key)
+            entry = _PooledModel(model)
+            entry.refs = 1
+            with self._lock:
+                self._entries[key] = entry
+                self._loads += 1
+            return entry
+
+    def _make_room(self, key: ModelKey):
+        """載入前淘汰閒置模型：維持數量上限，並盡量預留模型所需的記憶體"""
+        with self._lock:
+            overflow = len(self._entries) + 1 - self.max_models
+        if overflow > 0:
+            self._evict_idle(lambda k, e: True, limit=overflow)
+
+        if self.min_free_memory_mb > 0:
+            try:
+                needed = os.path.getsize(key.model_path) / (1024 * 1024) + self.min_free_memory_mb
+            except OSError:
+                needed = self.min_free_memory_mb
+            while True:
+                available = _available_memory_mb()
+                if available is None or available >= needed or not self._evict_idle(lambda k, e: True, limit=1):
+                    break
+
+    def _evict_idle(self, should_evict, limit: int | None = None) -> int:
+        """由最久未使用者開始卸載符合條件的閒置模型，回傳卸載數量"""
+        victims = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if limit is not None and len(victims) >= limit:
+                    break
+                if entry.refs == 0 and should_evict(key, entry):
+                    victims.append(self._entries.pop(key))
+            self._evictions += len(victims)
+        for entry in victims:
+            self._unloader(entry.model)
+            entry.model = None
+        if victims:
+            gc.collect()
+        return len(victims)
+
+    def _reap_loop(self):
+        """背景檢查：卸載閒置過久的模型，可用記憶體不足時卸載最久未使用的閒置模型"""
+        while not self._closed.wait(timeout=max(1.0, min(self.idle_ttl / 4, 30.0)) if self.idle_ttl > 0 else 30.0):
+            if self.idle_ttl > 0:
+                deadline = time.monotonic() - self.idle_ttl
+                self._evict_idle(lambda k, e: e.last_used <= deadline)
+            if self.min_free_memory_mb > 0:
+                available = _available_memory_mb()
+                if available is not None and available < self.min_free_memory_mb:
+                    self._evict_idle(lambda k, e: True, limit=1)
+
+    def unload_all(self) -> int:
+        """卸載所有閒置模型"""
+        return self._evict_idle(lambda k, e: True)
+
+    def close(self):
+        """停止背景檢查並卸載所有閒置模型"""
+        self._closed.set()
+        self.unload_all()
+
+    def stats(self) -> dict:
+        """已載入的模型與命中統計"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "max_models": self.max_models,
+                "idle_ttl": self.idle_ttl,
+                "loads": self._loads,
+                "hits": self._hits,
+                "evictions": self._evictions,
+                "models": [
+                    {
+                        **key._asdict(),
+                        "in_use": entry.refs > 0,
+                        "uses": entry.uses,
+                        "idle_seconds": round(now - entry.last_used, 1) if entry.refs == 0 else 0.0,
+                        "prefix_cache": entry.model.prefix_cache.stats() if getattr(entry.model, "prefix_cache", None) else None,
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
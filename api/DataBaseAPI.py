@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Path
-from typing import List, Optional
-from datetime import datetime
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, HTTPException, Query, Path, UploadFile, File, Form
+from typing import Any, List, Optional
+from datetime import datetime, date
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+import enum
+import json
+import os
+import tempfile
 
 from dataBase.FinanceDB import FinanceService, Direction, SortField
+from dataBase.importer import StatementImporter
 
 # --- 1. Pydantic Models (資料驗證模型) ---
 
@@ -38,6 +44,19 @@ class LogUpdate(BaseModel):
     note: Optional[str] = None
     timestamp: Optional[datetime] = None
 
+class LogBulkCreate(BaseModel):
+    # 逐筆以 LogCreate 驗證，單筆格式錯誤（含非物件的元素）不會讓整批回傳 422
+    logs: List[Any]
+
+class ExportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+class ImportFormat(str, enum.Enum):
+    CSV = "csv"
+    OFX = "ofx"
+    QIF = "qif"
+
 # --- 2. Dependency Injection Stub ---
 def get_service():
     """
@@ -46,6 +65,10 @@ def get_service():
     """
     raise NotImplementedError("Service not injected via dependency_overrides")
 
+def get_importer():
+    """佔位符，真正的 StatementImporter 會在 app.py 注入。"""
+    raise NotImplementedError("Importer not injected via dependency_overrides")
+
 # --- 3. Router 定義 ---
 router = APIRouter()
 
@@ -60,7 +83,7 @@ async def db_index():
 @router.get("/categories", response_model=List[CategoryResponse])
 async def get_all_categories(service: FinanceService = Depends(get_service)):
     """取得所有類別"""
-    return service.get_all_categories()
+    return await service.run(service.get_all_categories)
 
 @router.post("/categories", response_model=CategoryResponse)
 async def create_category(
@@ -69,7 +92,7 @@ async def create_category(
 ):
     """新增類別"""
     try:
-        result = service.add_category(category.name, category.default_direction)
+        result = await service.run(service.add_category, category.name, category.default_direction)
         return result
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -82,7 +105,8 @@ async def update_category(
 ):
     """修改類別"""
     try:
-        result = service.update_category(
+        result = await service.run(
+            service.update_category,
             category_id, 
             name=category.name, 
             default_type=category.default_direction
@@ -99,7 +123,7 @@ async def delete_category(
     service: FinanceService = Depends(get_service)
 ):
     """刪除類別 (依名稱，使用 Query Parameter 以支援特殊字元)"""
-    success = service.delete_category(name)
+    success = await service.run(service.delete_category, name)
     if not success:
         raise HTTPException(status_code=404, detail="Category not found or delete failed")
     return {"status": "success", "message": f"Category '{name}' deleted"}
@@ -115,7 +139,8 @@ async def create_log(
 ):
     """新增財務日誌"""
     try:
-        result = service.add_log(
+        result = await service.run(
+            service.add_log,
             category_name=log.category_name,
             amount=log.amount,
             actual_type=log.actual_type,
@@ -127,6 +152,41 @@ async def create_log(
         # 捕捉 Service 層拋出的錯誤，回傳 400 給前端
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/logs/bulk")
+async def create_logs_bulk(
+    payload: LogBulkCreate,
+    chunk_size: int = Query(1000, gt=0, description="每個交易寫入的筆數"),
+    service: FinanceService = Depends(get_service)
+):
+    """批次新增財務日誌，回傳成功筆數與逐筆錯誤"""
+    errors = []
+    entries = []
+    positions = []  # entries 對應的原始序號
+    for index, raw in enumerate(payload.logs):
+        try:
+            log = LogCreate.model_validate(raw)
+        except ValidationError as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+        entries.append({
+            "category_name": log.category_name,
+            "amount": log.amount,
+            "actual_type": log.actual_type,
+            "note": log.note,
+            "actuall_time": log.timestamp
+        })
+        positions.append(index)
+
+    try:
+        result = await service.run(service.add_logs_bulk, entries, chunk_size=chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    for error in result["errors"]:
+        error["index"] = positions[error["index"]]
+    errors = sorted(errors + result["errors"], key=lambda e: e["index"])
+    return {"inserted": result["inserted"], "failed": len(errors), "errors": errors}
+
 @router.delete("/logs/{log_id}")
 async def delete_log(
     log_id: int,
@@ -134,7 +194,7 @@ async def delete_log(
 ):
     """刪除日誌"""
     try:
-        success = service.delete_log(log_id)
+        success = await service.run(service.delete_log, log_id)
         if not success:
             raise HTTPException(status_code=404, detail="Log not found")
         return {"status": "success", "message": f"Log {log_id} deleted"}
@@ -149,7 +209,8 @@ async def update_log(
 ):
     """修改日誌"""
     try:
-        result = service.update_log(
+        result = await service.run(
+            service.update_log,
             log_id=log_id,
             category_name=log.category_name,
             actual_type=log.actual_type,
@@ -174,15 +235,113 @@ async def get_filtered_logs(
     note_keyword: Optional[str] = None,
     sort_by: SortField = SortField.TIMESTAMP,
     reverse: bool = True,
-    limit: Optional[int] = None,
+    limit: Optional[int] = Query(None, gt=0),
+    offset: Optional[int] = Query(None, ge=0),
+    paginate: bool = Query(False, description="使用游標分頁，回傳 {items, next_cursor}"),
+    cursor: Optional[str] = Query(None, description="上一頁回傳的 next_cursor"),
+    running_balance: bool = Query(False, description="附上累計淨額 running_balance (需依 timestamp 排序)"),
     service: FinanceService = Depends(get_service)
 ):
     """
     取得過濾並排序後的日誌 (搜尋功能)
     Url 範例: /logs?min_amount=100&sort_by=amount&reverse=false
+    游標分頁: /logs?paginate=true&limit=20 -> 以回傳的 next_cursor 帶入 cursor 取得下一頁
+    累計淨額: /logs?running_balance=true&limit=50 (跨頁連續，日期條件不影響起始值)
+    """
+    filters = dict(
+        category_name=category_name,
+        direction=direction,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        start_date=start_date,
+        end_date=end_date,
+        note_keyword=note_keyword,
+        sort_by=sort_by,
+        reverse=reverse,
+        running_balance=running_balance
+    )
+    try:
+        if paginate or cursor:
+            return await service.run(
+                service.get_logs_page,
+                limit=limit or 50,
+                cursor=cursor,
+                **filters
+            )
+        results = await service.run(
+            service.get_filtered_and_sorted_logs,
+            limit=limit,
+            offset=offset,
+            **filters
+        )
+        return results
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/balance")
+async def get_balance_curve(
+    start_date: Optional[date] = Query(None, description="開始日期"),
+    end_date: Optional[date] = Query(None, description="結束日期"),
+    category_name: Optional[str] = None,
+    service: FinanceService = Depends(get_service)
+):
+    """
+    每日淨額與累計淨額 (累計儲蓄曲線)，起始值包含開始日期之前的所有收支
+    Url 範例: /balance?start_date=2025-01-01&end_date=2025-12-31
+    """
+    return await service.run(service.get_balance_curve, start_date, end_date, category_name)
+
+@router.get("/logs/search")
+async def search_logs(
+    q: str = Query(..., min_length=1, description='備註關鍵字，空白分隔須全部符合，"..." 為片語'),
+    category_name: Optional[str] = None,
+    direction: Optional[Direction] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(50, gt=0, le=1000),
+    service: FinanceService = Depends(get_service)
+):
+    """
+    備註全文搜尋，依相關度排序 (SQLite 使用 FTS5 trigram 索引，支援中文子字串)
+    Url 範例: /logs/search?q=午餐 "星巴克 拿鐵"
+    """
+    try:
+        return await service.run(
+            service.search_logs,
+            q,
+            category_name=category_name,
+            direction=direction,
+            start_date=start_date,
+            end_date=end_date,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/logs/export")
+async def export_logs(
+    format: ExportFormat = ExportFormat.CSV,
+    category_name: Optional[str] = None,
+    direction: Optional[Direction] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    note_keyword: Optional[str] = None,
+    sort_by: SortField = SortField.TIMESTAMP,
+    reverse: bool = True,
+    service: FinanceService = Depends(get_service)
+):
+    """
+    串流匯出日誌 (CSV / NDJSON)，過濾條件同 /logs
+    Url 範例: /logs/export?format=ndjson&start_date=2025-01-01T00:00:00
     """
     try:
-        results = service.get_filtered_and_sorted_logs(
+        chunks = await service.run(
+            service.export_logs,
+            fmt=format.value,
             category_name=category_name,
             direction=direction,
             min_amount=min_amount,
@@ -191,10 +350,71 @@ async def get_filtered_logs(
             end_date=end_date,
             note_keyword=note_keyword,
             sort_by=sort_by,
-            reverse=reverse,
-            limit=limit
+            reverse=reverse
         )
-        return results
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
- 
\ No newline at end of file
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media_type = "text/csv; charset=utf-8" if format == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="finance_logs.{format.value}"'}
+    )
+
+# ==========================================
+# Import Endpoints (對帳單匯入)
+# ==========================================
+
+@router.post("/import")
+async def import_statement(
+    file: UploadFile = File(..., description="CSV / OFX / QIF 對帳單"),
+    format: ImportFormat = Form(ImportFormat.CSV),
+    mapping: Optional[str] = Form(None, description='CSV 欄位對應 JSON，例如 {"amount": "金額", "timestamp": "日期"}'),
+    default_category: Optional[str] = Form(None, description="檔案未提供類別時使用的類別"),
+    date_format: Optional[str] = Form(None, description="時間的 strptime 格式，例如 %Y/%m/%d"),
+    encoding: str = Form("utf-8-sig"),
+    service: FinanceService = Depends(get_service),
+    importer: StatementImporter = Depends(get_importer)
+):
+    """上傳對帳單並於背景匯入，回傳 job_id 供查詢進度"""
+    try:
+        column_mapping = json.loads(mapping) if mapping else None
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="mapping 必須為 JSON 物件")
+    if column_mapping is not None and not isinstance(column_mapping, dict):
+        raise HTTPException(status_code=400, detail="mapping 必須為 JSON 物件")
+
+    # 上傳檔在請求結束後即關閉，先分段複製到暫存檔再交給背景工作
+    fd, path = tempfile.mkstemp(suffix=f".{format.value}")
+    with os.fdopen(fd, "wb") as out:
+        while chunk := await file.read(1024 * 1024):
+            out.write(chunk)
+
+    try:
+        return importer.submit(
+            service,
+            path,
+            fmt=format.value,
+            mapping=column_mapping,
+            default_category=default_category,
+            date_format=date_format,
+            encoding=encoding,
+            filename=file.filename
+        )
+    except ValueError as e:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/import")
+async def list_import_jobs(importer: StatementImporter = Depends(get_importer)):
+    """列出匯入工作"""
+    return importer.list_jobs()
+
+@router.get("/import/{job_id}")
+async def get_import_job(job_id: str, importer: StatementImporter = Depends(get_importer)):
+    """查詢匯入工作進度 (processed / inserted / failed)"""
+    job = importer.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
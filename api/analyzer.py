@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
-import gc  
+from typing import Callable, Optional, Literal, List
+import asyncio
+import json
+import threading
+import time
 
 from dataBase.FinanceDB import FinanceDB, FinanceService
 from LLM.analyis import FinanceAnalysisEngine
-from LLM.advice import FinanceAdvisorLLM
+from LLM.model_pool import ModelPool
+from LLM.advice_cache import AdviceCache
+from LLM.inference_jobs import InferenceJob, InferenceJobQueue, QueueFullError
 from data.config import settings
 router = APIRouter()
 
@@ -14,6 +20,21 @@ class ReportRequest(BaseModel):
     start_date_time: datetime
     end_date_time: datetime
     system_prompt: Optional[str] = None
+    force_refresh: bool = False  # 忽略已快取的建議並重新推論
+
+class Period(BaseModel):
+    start_date_time: datetime
+    end_date_time: datetime
+
+class CompareRequest(BaseModel):
+    # 直接指定區間清單，或以 start/end 加上 period 自動切分
+    periods: Optional[List[Period]] = None
+    start_date_time: Optional[datetime] = None
+    end_date_time: Optional[datetime] = None
+    period: Literal["day", "week", "month"] = "month"
+
+MAX_COMPARE_PERIODS = 120
+MAX_TIMESERIES_BUCKETS = 3660  # 約 10 年的日資料
 
 def get_service():
     """
@@ -22,46 +43,288 @@ def get_service():
     """
     raise NotImplementedError("Service not injected via dependency_overrides")
 
+def get_model_pool():
+    """佔位符，常駐模型池由 app.py 注入"""
+    raise NotImplementedError("Model pool not injected via dependency_overrides")
+
+def get_advice_cache():
+    """佔位符，建議快取由 app.py 注入"""
+    raise NotImplementedError("Advice cache not injected via dependency_overrides")
+
+def get_job_queue():
+    """佔位符，推論工作佇列由 app.py 注入"""
+    raise NotImplementedError("Job queue not injected via dependency_overrides")
+
+def _advice_cache_key(report: dict, system_prompt: str) -> str:
+    """建議快取鍵：報告、prompt、模型與取樣參數任一改變都會產生新鍵"""
+    return AdviceCache.make_key(
+        report, system_prompt, settings.LLM_model_path,
+        {"temperature": settings.temperature, "max_tokens": settings.max_tokens}
+    )
+
+def _build_engine(service: FinanceService) -> FinanceAnalysisEngine:
+    """依目前設定建立分析引擎"""
+    return FinanceAnalysisEngine(
+        service,
+        anomaly_method=settings.anomaly_method,
+        anomaly_threshold=settings.anomaly_threshold,
+        anomaly_min_samples=settings.anomaly_min_samples,
+        anomaly_max_results=settings.anomaly_max_results,
+    )
+
+class _AdviceRequest:
+    """把 ReportRequest 解析為統計報告、prompt 與快取鍵 (建議端點共用)"""
+    def __init__(self, report_args: ReportRequest, report: dict, started: float | None = None):
+        self.report = report
+        self.started = time.perf_counter() if started is None else started  # 請求開始時間，供 model_ready_ms 統計
+        # 如果前端有傳入 system_prompt (且不是空字串)，就使用前端的；否則使用 default_system_prompt
+        self.prompt = report_args.system_prompt if report_args.system_prompt else settings.default_system_prompt
+        self.prompt_source = "custom" if report_args.system_prompt else "default"
+        self.force_refresh = report_args.force_refresh
+        self.model_key = (settings.LLM_model_path, settings.n_ctx, settings.n_threads)
+        self.cache_key = _advice_cache_key(report, self.prompt)
+        self.params = {
+            "start_date_time": report_args.start_date_time.isoformat(),
+            "end_date_time": report_args.end_date_time.isoformat(),
+            "prompt_source": self.prompt_source,
+        }
+
+    def cached_result(self, advice_cache: AdviceCache) -> dict | None:
+        if self.force_refresh:
+            return None
+        cached = advice_cache.get(self.cache_key)
+        if cached is None:
+            return None
+        return {"status": "success", "advice": cached["advice"], "prompt_source": self.prompt_source, "cached": True}
+
+    def runner(self, model_pool: ModelPool, advice_cache: AdviceCache,
+               on_event: Callable[[str, dict], None] | None = None):
+        """
+        回傳在推論工作執行緒執行的函式 run(cancel_event)
+        :param on_event: 逐筆接收 stream_advice 產生的 (事件, 資料)，供 SSE 端點轉送
+        """
+        def run(cancel: threading.Event):
+            # 從常駐模型池取得模型 (首次使用或模型路徑變更時才載入，之後的請求直接重用)
+            with model_pool.acquire(*self.model_key) as advisor:
+                if cancel.is_set():
+                    return None
+                model_ready_ms = round((time.perf_counter() - self.started) * 1000, 1)
+                parts, stats = [], {}
+                for event, data in advisor.stream_advice(self.report, self.prompt, should_stop=cancel.is_set):
+                    if event == "token":
+                        parts.append(data["text"])
+                    elif event == "done":
+                        stats = data["stats"]
+                        stats["model_ready_ms"] = model_ready_ms
+                    if on_event:
+                        on_event(event, data)
+            # 中途取消的結果不完整，不寫入快取
+            if stats.get("finish_reason") == "cancelled":
+                return None
+            advice = "".join(parts)
+            advice_cache.put(self.cache_key, advice)
+            return {"status": "success", "advice": advice, "prompt_source": self.prompt_source, "cached": False, "stats": stats}
+        return run
+
+async def _build_advice_request(report_args: ReportRequest, service: FinanceService) -> _AdviceRequest:
+    started = time.perf_counter()
+    engine = _build_engine(service)
+    report = await service.run(engine.get_structured_report, report_args.start_date_time, report_args.end_date_time)
+    return _AdviceRequest(report_args, report, started)
+
+async def _wait_for_job(job: InferenceJob, timeout: float | None = None):
+    """非阻塞地等待工作結束（以短間隔輪詢，不佔用執行緒）"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not job.done.is_set():
+        if deadline is not None and time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(0.1)
+
 # 修改 1: 改為 POST 以支援 Request Body
 @router.post("/get_analyze_report")
 async def generate_analysis_report(
     report_args: ReportRequest,
     service: FinanceService = Depends(get_service),
+    model_pool: ModelPool = Depends(get_model_pool),
+    advice_cache: AdviceCache = Depends(get_advice_cache),
+    job_queue: InferenceJobQueue = Depends(get_job_queue),
 ):
+    """
+    產生 AI 建議並等待結果
+    (推論交由背景工作佇列執行，等待期間其他 API 不受影響；不想維持連線時改用 /jobs)
+    """
     # 1. 執行數據統計
-    engine = FinanceAnalysisEngine(service)
-    report = engine.get_structured_report(report_args.start_date_time, report_args.end_date_time)
-    
-    if report.get("status") == "no_data":
+    advice = await _build_advice_request(report_args, service)
+    if advice.report.get("status") == "no_data":
         return {"status": "error", "message": "目前沒有足夠的財務資料進行分析。"}
+    print(advice.prompt)
 
-    # --- 新增邏輯：決定 Prompt ---
-    # 如果前端有傳入 system_prompt (且不是空字串)，就使用前端的；否則使用 default_system_prompt
-    use_prompt = report_args.system_prompt if report_args.system_prompt else settings.default_system_prompt
-    print(use_prompt)
-    # 2. 載入模型 (隨用隨載策略)
-    model_path = settings.LLM_model_path # 建議改為從 config 讀取
-    
-    advice_content = ""
-    advisor = None # 先宣告變數，避免 try 區塊出錯導致 finally 找不到變數
+    # 2. 相同報告與 prompt 的建議直接取自快取 (force_refresh 時略過)
+    cached = await service.run(advice.cached_result, advice_cache)
+    if cached is not None:
+        return cached
+
+    # 3. 排入推論工作佇列並等待完成
+    try:
+        job = job_queue.submit(advice.runner(model_pool, advice_cache), params=advice.params)
+    except QueueFullError as e:
+        return {"status": "error", "message": str(e)}
+    await _wait_for_job(job)
+    if job.status != "succeeded":
+        return {"status": "error", "message": f"AI 模型執行失敗: {job.error or job.status}"}
+    return job.result
 
+@router.post("/jobs", status_code=202)
+async def create_advice_job(
+    report_args: ReportRequest,
+    service: FinanceService = Depends(get_service),
+    model_pool: ModelPool = Depends(get_model_pool),
+    advice_cache: AdviceCache = Depends(get_advice_cache),
+    job_queue: InferenceJobQueue = Depends(get_job_queue),
+):
+    """
+    送出 AI 建議工作並立即回傳 job_id，之後以 GET /jobs/{job_id} 查詢或等待結果
+    快取命中時回傳已完成的工作；等待中的工作已達上限時回傳 429
+    """
+    advice = await _build_advice_request(report_args, service)
+    if advice.report.get("status") == "no_data":
+        raise HTTPException(status_code=400, detail="目前沒有足夠的財務資料進行分析。")
+
+    cached = await service.run(advice.cached_result, advice_cache)
+    if cached is not None:
+        job = job_queue.add_finished(cached, params=advice.params)
+    else:
+        try:
+            job = job_queue.submit(advice.runner(model_pool, advice_cache), params=advice.params)
+        except QueueFullError as e:
+            raise HTTPException(status_code=429, detail=str(e))
+    return job_queue.describe(job)
+
+@router.get("/jobs")
+async def get_job_queue_stats(job_queue: InferenceJobQueue = Depends(get_job_queue)):
+    """
+    回傳工作佇列深度與各狀態的工作數
+    """
+    return job_queue.stats()
+
+@router.get("/jobs/{job_id}")
+async def get_advice_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="最多等待秒數，工作在此之前結束則立即回傳"),
+    job_queue: InferenceJobQueue = Depends(get_job_queue),
+):
+    """
+    查詢工作狀態、結果與耗時 (queue_ms / run_ms / total_ms)
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="找不到此工作")
+    if wait:
+        await _wait_for_job(job, wait)
+    return job_queue.describe(job)
+
+@router.delete("/jobs/{job_id}")
+async def cancel_advice_job(job_id: str, job_queue: InferenceJobQueue = Depends(get_job_queue)):
+    """
+    取消工作：排隊中者直接移除，執行中者在下一個 token 停止
+    """
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="找不到此工作")
+    return job_queue.describe(job)
+
+def _sse(event: str, data: dict) -> str:
+    """格式化一則 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _stream_events(request: Request, events: asyncio.Queue, job: InferenceJob | None, job_queue: InferenceJobQueue):
+    """
+    把推論工作送進 events 的 (事件, 資料) 轉為 SSE 逐筆送出，收到 None 時結束
+    用戶端斷線（或回應被取消）時取消工作：排隊中者直接移除，執行中者在下一個 token 停止並歸還模型
+    """
     try:
-        advisor = FinanceAdvisorLLM(model_path=model_path)
-        # 這裡傳入剛剛決定好的 use_prompt
-        advice_content = advisor.generate_advice(report, system_prompt=use_prompt)
-    except Exception as e:
-        return {"status": "error", "message": f"AI 模型執行失敗: {str(e)}"}
+        while True:
+            try:
+                item = await asyncio.wait_for(events.get(), timeout=1.0)
+            except asyncio.TimeoutError:
+                # 排隊、等待模型或 prompt 處理期間沒有輸出，定期確認用戶端是否仍在線
+                if await request.is_disconnected():
+                    break
+                if job is not None and job.done.is_set() and job.started_at is None:
+                    # 工作在開始執行前就被取消 (例如 DELETE /jobs/{job_id})，不會再有任何事件
+                    yield _sse("error", {"message": "工作已取消"})
+                    break
+                continue
+            if item is None:
+                break
+            yield _sse(*item)
     finally:
-        # 3. 確保模型用完後立即釋放記憶體
-        if advisor:
-            del advisor
-        gc.collect() # 強制執行垃圾回收
+        if job is not None and not job.finished:
+            job_queue.cancel(job.id)
 
-    return {
-        "status": "success",
-        "advice": advice_content,
-        "prompt_source": "custom" if report_args.system_prompt else "default"
-    }
+@router.post("/get_analyze_report/stream")
+async def stream_analysis_report(
+    report_args: ReportRequest,
+    request: Request,
+    service: FinanceService = Depends(get_service),
+    model_pool: ModelPool = Depends(get_model_pool),
+    advice_cache: AdviceCache = Depends(get_advice_cache),
+    job_queue: InferenceJobQueue = Depends(get_job_queue),
+):
+    """
+    串流版的 AI 建議 (text/event-stream)
+    事件依序為 meta (立即送出，含 job_id)、token (逐 token 文字)、done (含首 token 延遲與生成速度等統計)；失敗時送出 error
+    推論與 /jobs 共用同一個工作佇列：等待中的工作已達上限時回傳 429，執行中可用 DELETE /jobs/{job_id} 取消
+    快取命中時以單一 token 事件送出完整建議；用戶端斷線後停止生成並釋放模型
+    """
+    advice = await _build_advice_request(report_args, service)
+    events: asyncio.Queue = asyncio.Queue()
+    meta = {"prompt_source": advice.prompt_source, "cached": False}
+
+    if advice.report.get("status") == "no_data":
+        for item in (("meta", meta), ("error", {"message": "目前沒有足夠的財務資料進行分析。"}), None):
+            events.put_nowait(item)
+        job = None
+    else:
+        cached = await service.run(advice.cached_result, advice_cache)
+        if cached is not None:
+            job = job_queue.add_finished(cached, params=advice.params)
+            stats = {"total_ms": round((time.perf_counter() - advice.started) * 1000, 1), "finish_reason": "cached"}
+            for item in (("meta", {**meta, "cached": True, "job_id": job.id}), ("token", {"text": cached["advice"]}),
+                         ("done", {"stats": stats}), None):
+                events.put_nowait(item)
+        else:
+            loop = asyncio.get_running_loop()
+
+            def put(item):
+                try:
+                    loop.call_soon_threadsafe(events.put_nowait, item)
+                except RuntimeError:  # 事件迴圈已關閉，回應已不存在
+                    pass
+
+            runner = advice.runner(model_pool, advice_cache, on_event=lambda event, data: put((event, data)))
+
+            def run(cancel: threading.Event):
+                try:
+                    return runner(cancel)
+                except Exception as e:
+                    put(("error", {"message": f"AI 模型執行失敗: {str(e)}"}))
+                    raise
+                finally:
+                    put(None)
+
+            try:
+                job = job_queue.submit(run, kind="advice_stream", params=advice.params)
+            except QueueFullError as e:
+                raise HTTPException(status_code=429, detail=str(e))
+            # 工作執行緒的事件由 call_soon_threadsafe 排入，必定在 meta 之後
+            events.put_nowait(("meta", {**meta, "job_id": job.id, "queue_position": job_queue.describe(job)["queue_position"]}))
+
+    return StreamingResponse(
+        _stream_events(request, events, job, job_queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/get_report")
 async def get_statistics_report(
@@ -71,8 +334,8 @@ async def get_statistics_report(
     """
     回傳財務統計數據 (JSON)
     """
-    engine = FinanceAnalysisEngine(service)
-    report = engine.get_structured_report(report_args.start_date_time, report_args.end_date_time)
+    engine = _build_engine(service)
+    report = await service.run(engine.get_structured_report, report_args.start_date_time, report_args.end_date_time)
     
     if report.get("status") == "no_data":
         return {
@@ -83,4 +346,95 @@ async def get_statistics_report(
     return {
         "status": "success", 
         "data": report
-    }
\ No newline at end of file
+    }
+
+@router.post("/compare")
+async def get_comparison_report(
+    compare_args: CompareRequest,
+    service: FinanceService = Depends(get_service)
+):
+    """
+    多區間比較：每個區間回傳與 /get_report 相同的指標，並附上與前一區間的差異 (delta)
+    所有區間在同一次快照切片上計算，24 個月的趨勢成本約等於一份報告
+    """
+    if compare_args.periods:
+        periods = [(p.start_date_time, p.end_date_time) for p in compare_args.periods]
+        if len(periods) > MAX_COMPARE_PERIODS:
+            raise HTTPException(status_code=400, detail=f"區間數量超過上限 {MAX_COMPARE_PERIODS}")
+        if any(start > end for start, end in periods):
+            raise HTTPException(status_code=400, detail="開始時間不可晚於結束時間")
+    elif compare_args.start_date_time and compare_args.end_date_time:
+        try:
+            periods = service.split_periods(
+                compare_args.start_date_time,
+                compare_args.end_date_time,
+                compare_args.period,
+                MAX_COMPARE_PERIODS
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    else:
+        raise HTTPException(status_code=400, detail="請提供 periods，或 start_date_time 與 end_date_time")
+
+    engine = _build_engine(service)
+    result = await service.run(engine.get_comparison_report, periods)
+    return {
+        "status": "success",
+        "data": result
+    }
+
+@router.get("/timeseries")
+async def get_timeseries(
+    bucket: Literal["day", "week", "month"] = "day",
+    start: Optional[datetime] = Query(None, description="開始時間"),
+    end: Optional[datetime] = Query(None, description="結束時間"),
+    group_by: Literal["category", "direction"] = "direction",
+    service: FinanceService = Depends(get_service)
+):
+    """
+    回傳分桶後的收支時間序列 (空桶補 0)，供儀表板圖表使用
+    Url 範例: /timeseries?bucket=month&start=2025-01-01T00:00:00&group_by=category
+    區間數超過 MAX_TIMESERIES_BUCKETS 時回傳 400
+    """
+    try:
+        return await service.run(service.get_timeseries, bucket, start, end, group_by, MAX_TIMESERIES_BUCKETS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/models")
+async def get_loaded_models(model_pool: ModelPool = Depends(get_model_pool)):
+    """
+    回傳常駐模型池中已載入的模型與載入/重用次數
+    """
+    return model_pool.stats()
+
+@router.post("/models/unload")
+async def unload_models(model_pool: ModelPool = Depends(get_model_pool)):
+    """
+    立即卸載所有閒置中的模型以釋放記憶體 (下次請求時重新載入)
+    """
+    return {"status": "success", "unloaded": model_pool.unload_all()}
+
+@router.get("/cache_stats")
+async def get_report_cache_stats(
+    service: FinanceService = Depends(get_service),
+    advice_cache: AdviceCache = Depends(get_advice_cache),
+):
+    """
+    回傳報表結果快取的命中統計 (統計報表與目標報表共用)、欄式快照狀態與 AI 建議快取統計
+    """
+    return {
+        **service.report_cache.stats(),
+        "snapshot": service.db.snapshot.stats(),
+        "advice_cache": await service.run(advice_cache.stats),
+    }
+
+@router.delete("/advice_cache")
+async def clear_advice_cache(
+    service: FinanceService = Depends(get_service),
+    advice_cache: AdviceCache = Depends(get_advice_cache),
+):
+    """
+    清除所有已快取的 AI 建議
+    """
+    return {"status": "success", "deleted": await service.run(advice_cache.clear)}
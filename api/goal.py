@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from datetime import datetime
+from typing import Literal
 
 # 引用工具與配置
-from goal.goal_tool import generate_goal_report
+from goal.goal_tool import generate_goal_report, generate_goal_forecast
 from data.config import settings
 from dataBase.FinanceDB import FinanceService
 
@@ -16,14 +17,20 @@ router = APIRouter()
 async def get_goal_achievement_report(
     start_date: datetime = Query(..., description="開始日期 (YYYY-MM-DD)"),
     end_date: datetime = Query(..., description="結束日期 (YYYY-MM-DD)"),
+    forecast: bool = Query(False, description="預測區間結束時的結果與達標機率"),
+    method: Literal["ewma", "trend", "seasonal"] = Query("ewma", description="預測方法 (forecast=true 時使用)"),
     service: FinanceService = Depends(get_service)
 ):
     """
     產生目標達成率報表
+    forecast=true 時改為預測模式：依目前為止的每日收支推估期末數字，並回傳各目標的達成機率
     """
     try:
         # 這裡依然需要 settings.goul_path 來讀取目標以進行比對
-        report = generate_goal_report(service, settings.goul_path, start_date, end_date)
+        if forecast:
+            report = await service.run(generate_goal_forecast, service, settings.goul_path, start_date, end_date, method)
+        else:
+            report = await service.run(generate_goal_report, service, settings.goul_path, start_date, end_date)
         
         if "error" in report:
             raise HTTPException(status_code=400, detail=report["error"])
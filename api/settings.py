@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional, Tuple
+from pydantic import BaseModel, Field
+from typing import Optional, Tuple, Literal
 from data.config import settings  # 匯入單例物件
 from goal.goal_tool import read_goal_data, update_goal_data # 匯入工具
 
@@ -9,12 +9,43 @@ router = APIRouter()
 # --- System Settings Models ---
 class SettingsUpdate(BaseModel):
     sql_url: Optional[str] = None
+    db_pool_size: Optional[int] = None
+    db_max_overflow: Optional[int] = None
+    db_pool_recycle: Optional[int] = None
+    db_workers: Optional[int] = None
+    category_cache_ttl: Optional[float] = None
+    report_cache_size: Optional[int] = Field(None, ge=0)
+    report_cache_ttl: Optional[float] = Field(None, ge=0)
+    # 異常支出偵測（mad: 各類別中位數/MAD，zscore: 各類別平均數/標準差）
+    anomaly_method: Optional[Literal["mad", "zscore"]] = None
+    anomaly_threshold: Optional[float] = Field(None, gt=0)
+    anomaly_min_samples: Optional[int] = Field(None, ge=1)
+    anomaly_max_results: Optional[int] = Field(None, ge=1)
+    # SQLite 儲存效能設定（呼叫 /api/system/restart-db 後生效）
+    sqlite_profile: Optional[Literal["safe", "balanced", "throughput"]] = None
+    sqlite_journal_mode: Optional[Literal["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"]] = None
+    sqlite_synchronous: Optional[Literal["OFF", "NORMAL", "FULL", "EXTRA"]] = None
+    sqlite_mmap_size: Optional[int] = Field(None, ge=0)
+    sqlite_cache_size: Optional[int] = None
+    sqlite_temp_store: Optional[Literal["DEFAULT", "FILE", "MEMORY"]] = None
     LLM_model_path: Optional[str] = None
     default_system_prompt: Optional[str] = None
     temperature: Optional[float] = None
     max_tokens: Optional[int] = None
     n_ctx: Optional[int] = None
     n_threads: Optional[int] = None
+    # 常駐模型池（呼叫 /api/system/restart-db 後生效）
+    llm_pool_size: Optional[int] = Field(None, ge=1)
+    llm_idle_ttl: Optional[float] = Field(None, ge=0)
+    llm_min_free_memory_mb: Optional[float] = Field(None, ge=0)
+    # 每個模型保存 system prompt 前綴狀態的容量（MB，0 表示停用；新載入的模型生效）
+    llm_prefix_cache_mb: Optional[float] = Field(None, ge=0)
+    # 推論工作佇列（重新啟動程式後生效）
+    llm_job_queue_size: Optional[int] = Field(None, ge=1)
+    llm_job_history: Optional[int] = Field(None, ge=0)
+    # AI 建議快取（SQLite 檔案，0 表示停用；呼叫 /api/system/restart-db 後生效）
+    advice_cache_path: Optional[str] = None
+    advice_cache_size: Optional[int] = Field(None, ge=0)
 
 # --- Goal Settings Models ---
 class GoalConfig(BaseModel):
@@ -10,7 +10,11 @@ from api import analyzer
 from api import goal
 from api import settings as api_settings
 
-from dataBase.FinanceDB import FinanceDB,FinanceService
+from dataBase.FinanceDB import FinanceDB,FinanceService,resolve_sqlite_pragmas
+from dataBase.importer import StatementImporter
+from LLM.model_pool import ModelPool
+from LLM.advice_cache import AdviceCache
+from LLM.inference_jobs import InferenceJobQueue
 from data.config import settings 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -24,13 +28,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-db = FinanceDB(db_url=settings.sql_url, echo=False)
-service = FinanceService(db)
+def build_service(cfg) -> tuple[FinanceDB, FinanceService]:
+    """依設定建立資料庫連線池與 Service"""
+    new_db = FinanceDB(
+        db_url=cfg.sql_url,
+        echo=False,
+        pool_size=cfg.db_pool_size,
+        max_overflow=cfg.db_max_overflow,
+        pool_recycle=cfg.db_pool_recycle,
+        sqlite_pragmas=resolve_sqlite_pragmas(cfg.sqlite_profile, cfg.sqlite_pragmas)
+    )
+    return new_db, FinanceService(
+        new_db,
+        max_workers=cfg.db_workers,
+        category_cache_ttl=cfg.category_cache_ttl,
+        report_cache_size=cfg.report_cache_size,
+        report_cache_ttl=cfg.report_cache_ttl
+    )
+
+def build_model_pool(cfg) -> ModelPool:
+    """依設定建立常駐 LLM 模型池"""
+    return ModelPool(
+        max_models=cfg.llm_pool_size,
+        idle_ttl=cfg.llm_idle_ttl,
+        min_free_memory_mb=cfg.llm_min_free_memory_mb
+    )
+
+db, service = build_service(settings)
+model_pool = build_model_pool(settings)
+advice_cache = AdviceCache(settings.advice_cache_path, max_entries=settings.advice_cache_size)
+# 推論工作佇列不隨 restart-db 重建，工作使用送出當下注入的模型池與快取
+job_queue = InferenceJobQueue(max_queue=settings.llm_job_queue_size, max_history=settings.llm_job_history)
+importer = StatementImporter()
 
 DIST_DIR = os.path.join(os.path.dirname(__file__), "UI")
 
 app.dependency_overrides[DataBaseAPI.get_service] = lambda: service
+app.dependency_overrides[DataBaseAPI.get_importer] = lambda: importer
 app.dependency_overrides[analyzer.get_service] = lambda: service
+app.dependency_overrides[analyzer.get_model_pool] = lambda: model_pool
+app.dependency_overrides[analyzer.get_advice_cache] = lambda: advice_cache
+app.dependency_overrides[analyzer.get_job_queue] = lambda: job_queue
 app.dependency_overrides[goal.get_service] = lambda: service
 
 app.include_router(api_model_ex.router,prefix='/api/test',tags=['Test'])
@@ -41,7 +79,7 @@ app.include_router(api_settings.router, prefix='/api/settings', tags=['Settings'
 
 @app.post("/api/system/restart-db", tags=['System'])
 async def restart_database():
-    global db, service
+    global db, service, model_pool, advice_cache
     try:
         # [修正] 必須在這裡明確 import 模組物件，importlib 才能 reload 它
         import data.config 
@@ -53,19 +91,40 @@ async def restart_database():
         print(f"[System] Reloading DB with URL: {new_settings.sql_url}")
         
         # 2. 重新建立連線物件
-        new_db = FinanceDB(db_url=new_settings.sql_url, echo=False)
+        new_db, new_service = build_service(new_settings)
         
-        # 4. 替換全域變數
+        # 3. 替換全域變數，並釋放舊的連線池與工作執行緒
+        old_service = service
         db = new_db
-        service = FinanceService(db)
+        service = new_service
+        old_service.close()
+
+        # 4. 模型池參數可能已變更：換新池，舊池中的閒置模型立即卸載（使用中的模型在請求結束後由 GC 回收）
+        old_pool = model_pool
+        model_pool = build_model_pool(new_settings)
+        old_pool.close()
+        advice_cache = AdviceCache(new_settings.advice_cache_path, max_entries=new_settings.advice_cache_size)
         
-        return {"status": "success", "message": "Database re-connected successfully", "url": new_settings.sql_url}
+        return {
+            "status": "success",
+            "message": "Database re-connected successfully",
+            "url": new_settings.sql_url,
+            "sqlite_pragmas": db.get_sqlite_pragmas()
+        }
         
     except Exception as e:
         print(f"[System] DB Restart Failed: {e}")
         # traceback.print_exc() # 開發時建議打開這個看詳細錯誤
         raise HTTPException(status_code=500, detail=f"Database restart failed: {str(e)}")
 
+@app.post("/api/system/rebuild-summary", tags=['System'])
+async def rebuild_daily_summary():
+    """從 finance_log 重建 daily_summary（資料庫被外部程式修改後使用）"""
+    try:
+        return await service.run(service.rebuild_daily_summary)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Summary rebuild failed: {str(e)}")
+
 @app.get("/api/health")
 async def health_check():
     return {"status": "ok"}
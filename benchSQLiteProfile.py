@@ -0,0 +1,100 @@
+"""比較各 SQLite 儲存設定檔的寫入/讀取吞吐量
+
+用法: python benchSQLiteProfile.py [單筆寫入筆數] [批次寫入筆數]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from dataBase.FinanceDB import FinanceDB, FinanceService, Direction, SQLITE_PROFILES, resolve_sqlite_pragmas
+from testTool import print_table
+
+
+def _seed_entries(n: int) -> list[dict]:
+    start = datetime(2020, 1, 1)
+    return [
+        {
+            "category_name": random.choice(("餐費", "交通", "薪水")),
+            "amount": round(random.uniform(10, 5000), 2),
+            "note": f"bench {i}",
+            "actuall_time": start + timedelta(minutes=random.randint(0, 60 * 24 * 365 * 3)),
+        }
+        for i in range(n)
+    ]
+
+
+def bench_profile(profile: str, single_writes: int, bulk_rows: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), f"{profile}.db")
+    db = FinanceDB(db_url=f"sqlite:///{path}", sqlite_pragmas=resolve_sqlite_pragmas(profile))
+    service = FinanceService(db)
+    try:
+        service.add_category("餐費", Direction.Expenditure)
+        service.add_category("交通", Direction.Expenditure)
+        service.add_category("薪水", Direction.Income)
+
+        # 1. 每筆一個交易（最受 fsync 影響）
+        t = time.perf_counter()
+        for entry in _seed_entries(single_writes):
+            service.add_log(entry["category_name"], entry["amount"], note=entry["note"], actuall_time=entry["actuall_time"])
+        single_rate = single_writes / (time.perf_counter() - t)
+
+        # 2. 批次寫入
+        entries = _seed_entries(bulk_rows)
+        t = time.perf_counter()
+        service.add_logs_bulk(entries)
+        bulk_rate = bulk_rows / (time.perf_counter() - t)
+
+        # 3. 讀取：一年區間的彙總 + 最新 20 筆
+        reads = 50
+        t = time.perf_counter()
+        for _ in range(reads):
+            service.summarize_logs(("category",), start_date=datetime(2021, 1, 1), end_date=datetime(2022, 1, 1))
+            service.get_filtered_and_sorted_logs(limit=20)
+        read_rate = reads / (time.perf_counter() - t)
+
+        # 4. 寫入進行中同時讀取（rollback journal 下容易遇到 database is locked）
+        errors = []
+        def writer():
+            try:
+                for chunk_start in range(0, len(entries), 1000):
+                    service.add_logs_bulk(entries[chunk_start:chunk_start + 1000])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.remove_session()
+        thread = threading.Thread(target=writer)
+        concurrent_reads = 0
+        t = time.perf_counter()
+        thread.start()
+        while thread.is_alive():
+            try:
+                service.summarize_logs(("actual_type",))
+                concurrent_reads += 1
+            except Exception as e:
+                errors.append(e)
+        thread.join()
+        concurrent_rate = concurrent_reads / (time.perf_counter() - t)
+
+        return {
+            "profile": profile,
+            "journal_mode": db.get_sqlite_pragmas()["journal_mode"],
+            "single_writes/s": f"{single_rate:,.0f}",
+            "bulk_rows/s": f"{bulk_rate:,.0f}",
+            "report_reads/s": f"{read_rate:,.1f}",
+            "reads_during_import/s": f"{concurrent_rate:,.1f}",
+            "errors": len(errors),
+        }
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    single = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    bulk = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    random.seed(0)
+    rows = [bench_profile(profile, single, bulk) for profile in SQLITE_PROFILES]
+    print_table(f"SQLite 設定檔效能比較 (單筆 {single} 筆 / 批次 {bulk} 筆)", rows)
@@ -8,10 +8,35 @@ class Settings:
     # 預設值
     _defaults = {# 這是預設給Docker環境的配置
         "sql_url": "sqlite:////app/data/DB/test.db", 
+        "db_pool_size": 5,
+        "db_max_overflow": 10,
+        "db_pool_recycle": 1800,
+        "db_workers": 8,
+        "category_cache_ttl": 5.0,
+        "report_cache_size": 128,
+        "report_cache_ttl": 300.0,
+        "anomaly_method": "mad",
+        "anomaly_threshold": 3.5,
+        "anomaly_min_samples": 5,
+        "anomaly_max_results": 20,
+        "sqlite_profile": "balanced",
+        "sqlite_journal_mode": None,
+        "sqlite_synchronous": None,
+        "sqlite_mmap_size": None,
+        "sqlite_cache_size": None,
+        "sqlite_temp_store": None,
         "goul_path": "./data/goal.json",
         "LLM_model_path": r"/app/data/models/llama-3-taiwan-8B-instruct-q5_k_m.gguf",
         "n_ctx": 0,
         "n_threads": 16,
+        "llm_pool_size": 1,
+        "llm_idle_ttl": 600.0,
+        "llm_min_free_memory_mb": 0,
+        "llm_prefix_cache_mb": 1024,
+        "llm_job_queue_size": 8,
+        "llm_job_history": 100,
+        "advice_cache_path": "./data/advice_cache.db",
+        "advice_cache_size": 256,
         "default_system_prompt": """你是一位專業財務顧問，只提供高效、精確且不廢話的財務洞察。請只用繁體中文
 [要求]
 1. 找出一個最需要削減的支出類別。
@@ -54,6 +79,50 @@ class Settings:
     @property
     def sql_url(self) -> str: return self._cache.get("sql_url")
     
+    @property
+    def db_pool_size(self) -> int: return int(self._cache.get("db_pool_size"))
+
+    @property
+    def db_max_overflow(self) -> int: return int(self._cache.get("db_max_overflow"))
+
+    @property
+    def db_pool_recycle(self) -> int: return int(self._cache.get("db_pool_recycle"))
+
+    @property
+    def db_workers(self) -> int: return int(self._cache.get("db_workers"))
+
+    @property
+    def category_cache_ttl(self) -> float: return float(self._cache.get("category_cache_ttl"))
+
+    @property
+    def report_cache_size(self) -> int: return int(self._cache.get("report_cache_size"))
+
+    @property
+    def report_cache_ttl(self) -> float: return float(self._cache.get("report_cache_ttl"))
+
+    @property
+    def anomaly_method(self) -> str: return self._cache.get("anomaly_method")
+
+    @property
+    def anomaly_threshold(self) -> float: return float(self._cache.get("anomaly_threshold"))
+
+    @property
+    def anomaly_min_samples(self) -> int: return int(self._cache.get("anomaly_min_samples"))
+
+    @property
+    def anomaly_max_results(self) -> int: return int(self._cache.get("anomaly_max_results"))
+
+    @property
+    def sqlite_profile(self) -> str: return self._cache.get("sqlite_profile")
+
+    @property
+    def sqlite_pragmas(self) -> dict:
+        """個別 PRAGMA 覆寫值（None 表示沿用 sqlite_profile）"""
+        return {
+            key: self._cache.get(f"sqlite_{key}")
+            for key in ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store")
+        }
+
     @property
     def goul_path(self) -> str: return self._cache.get("goul_path")
 
@@ -66,6 +135,30 @@ class Settings:
     @property
     def n_threads(self) -> int: return int(self._cache.get("n_threads"))
 
+    @property
+    def llm_pool_size(self) -> int: return int(self._cache.get("llm_pool_size"))
+
+    @property
+    def llm_idle_ttl(self) -> float: return float(self._cache.get("llm_idle_ttl"))
+
+    @property
+    def llm_min_free_memory_mb(self) -> float: return float(self._cache.get("llm_min_free_memory_mb"))
+
+    @property
+    def llm_prefix_cache_mb(self) -> float: return float(self._cache.get("llm_prefix_cache_mb"))
+
+    @property
+    def llm_job_queue_size(self) -> int: return int(self._cache.get("llm_job_queue_size"))
+
+    @property
+    def llm_job_history(self) -> int: return int(self._cache.get("llm_job_history"))
+
+    @property
+    def advice_cache_path(self) -> str: return self._cache.get("advice_cache_path")
+
+    @property
+    def advice_cache_size(self) -> int: return int(self._cache.get("advice_cache_size"))
+
     @property
     def default_system_prompt(self) -> str: return self._cache.get("default_system_prompt")
 
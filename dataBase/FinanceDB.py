@@ -1,7 +1,25 @@
-from sqlalchemy import create_engine, Column, Integer, String, Enum, ForeignKey, Float, DateTime
-from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy import create_engine, Column, Integer, String, Enum, ForeignKey, Float, Date, DateTime, Index, and_, or_, insert, update, delete, select, case, func, text, event, type_coerce, column
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import declarative_base, sessionmaker, relationship, scoped_session
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date, timedelta
+import asyncio
+import base64
+import csv
 import enum
+import functools
+import io
+import json
+import re
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from dataBase.ledger_snapshot import LedgerSnapshot, LedgerVersion, LedgerView, SNAPSHOT_COLUMNS, to_naive_utc
+from dataBase.result_cache import ResultCache
 
 Base = declarative_base()
 
@@ -34,26 +52,456 @@ class FinanceLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     category = relationship("Category", back_populates="logs")
 
+    # 依 get_logs_with_sorting 的過濾/排序路徑設計的索引
+    __table_args__ = (
+        Index("ix_finance_log_timestamp", "timestamp"),
+        Index("ix_finance_log_category_timestamp", "category_id", "timestamp"),
+        Index("ix_finance_log_type_timestamp", "actual_type", "timestamp"),
+        Index("ix_finance_log_amount", "amount"),
+    )
+
+class DailySummary(Base):
+    """每日彙總 (日期, 類別, 實際方向)，由 FinanceDB 的寫入方法在同一交易中維護"""
+    __tablename__ = "daily_summary"
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False)
+    category_id = Column(Integer)
+    actual_type = Column("actual_type", Enum(Direction))
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
+    min_amount = Column(Float)
+    max_amount = Column(Float)
+
+    __table_args__ = (
+        Index("ux_daily_summary_key", "day", "category_id", "actual_type", unique=True),
+    )
+
+class LedgerMeta(Base):
+    """資料版本計數器，供快取判斷資料是否被修改"""
+    __tablename__ = "ledger_meta"
+    key = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+CATEGORY_VERSION_KEY = "category_version"
+# finance_log 的新增與修改/刪除分別計數（見 LedgerVersion）
+LOG_INSERT_VERSION_KEY = "log_insert_version"
+LOG_CHANGE_VERSION_KEY = "log_change_version"
+_VERSION_KEYS = (CATEGORY_VERSION_KEY, LOG_INSERT_VERSION_KEY, LOG_CHANGE_VERSION_KEY)
+
+# note 全文檢索：FTS5 trigram 可比對任意子字串（含中文），但關鍵字至少需 3 個字元
+NOTE_FTS_TABLE = "finance_log_fts"
+NOTE_FTS_MIN_LENGTH = 3
+_SEARCH_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+def parse_search_terms(query: str) -> list[str]:
+    """把搜尋字串拆成關鍵字：以雙引號包住的片語視為一個詞，結尾的 * 前綴符號會被移除
+    （trigram 以子字串比對，本身即涵蓋前綴）"""
+    terms = []
+    for phrase, word in _SEARCH_TERM.findall(query or ""):
+        term = (phrase or word).strip().rstrip("*")
+        if term:
+            terms.append(term)
+    return terms
+
+def _fts_phrase(term: str) -> str:
+    """轉為 FTS5 片語語法（雙引號跳脫）"""
+    return '"' + term.replace('"', '""') + '"'
+
+# 欄式快照中交易方向的 int8 編碼（無方向為 -1）
+DIRECTION_CODES = {Direction.Income: 0, Direction.Expenditure: 1}
+
+# get_log_rows_with_sorting 投影的欄位（順序即回傳 tuple 的順序）
+LOG_ROW_COLUMNS = (
+    FinanceLog.id,
+    FinanceLog.category_id,
+    Category.name,
+    FinanceLog.actual_type,
+    FinanceLog.amount,
+    FinanceLog.note,
+    FinanceLog.timestamp,
+)
+
+# 帶正負號的金額：收入為正、支出為負，供累計淨額計算
+SIGNED_AMOUNT = case(
+    (FinanceLog.actual_type == Direction.Income, FinanceLog.amount),
+    (FinanceLog.actual_type == Direction.Expenditure, -FinanceLog.amount),
+    else_=0.0
+)
+
+# get_log_aggregates 可用的分組欄位
+AGGREGATE_GROUP_COLUMNS = {
+    "actual_type": FinanceLog.actual_type,
+    "category": Category.name,
+    "day": type_coerce(func.date(FinanceLog.timestamp), Date),
+}
+
+# SQLite 儲存效能設定檔（連線建立時以 PRAGMA 套用）
+SQLITE_PROFILES = {
+    # 預設 rollback journal，每次 commit 完整 fsync
+    "safe": {"journal_mode": "DELETE", "synchronous": "FULL", "mmap_size": 0, "cache_size": -2000, "temp_store": "DEFAULT"},
+    # WAL 讓讀寫互不阻塞；NORMAL 在 WAL 下只有斷電才可能遺失最後的交易
+    "balanced": {"journal_mode": "WAL", "synchronous": "NORMAL", "mmap_size": 268435456, "cache_size": -64000, "temp_store": "MEMORY"},
+    # 匯入/批次用：不 fsync，當機可能遺失最近的交易
+    "throughput": {"journal_mode": "WAL", "synchronous": "OFF", "mmap_size": 1073741824, "cache_size": -256000, "temp_store": "MEMORY"},
+}
+_SQLITE_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+def resolve_sqlite_pragmas(profile: str | None = "balanced", overrides: dict | None = None) -> dict:
+    """合併設定檔與個別覆寫值並檢查合法性
+    
+    Args:
+        profile: SQLITE_PROFILES 的名稱（None 表示不套用設定檔）
+        overrides: 個別 PRAGMA 覆寫值，值為 None 者沿用設定檔
+    Returns:
+        dict: PRAGMA 名稱 -> 值
+    """
+    if profile is not None and profile not in SQLITE_PROFILES:
+        raise ValueError(f"未知的 SQLite 設定檔: {profile}")
+    pragmas = dict(SQLITE_PROFILES[profile]) if profile else {}
+    pragmas.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    for key, value in pragmas.items():
+        if key in _SQLITE_PRAGMA_CHOICES:
+            value = str(value).upper()
+            if value not in _SQLITE_PRAGMA_CHOICES[key]:
+                raise ValueError(f"{key} 不支援 {value}")
+        elif key in ("mmap_size", "cache_size"):
+            value = int(value)
+        else:
+            raise ValueError(f"不支援的 PRAGMA: {key}")
+        pragmas[key] = value
+    return pragmas
+
+# 可由 daily_summary 回答的過濾條件與分組欄位
+ROLLUP_FILTER_KEYS = {"category_id", "actual_type", "start_date", "end_date"}
+ROLLUP_GROUP_COLUMNS = {
+    "actual_type": DailySummary.actual_type,
+    "category": Category.name,
+    "day": DailySummary.day,
+}
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
 class FinanceDB:
     """資料層：只負責資料存取與基本 CRUD，回傳 ORM 物件或清單。"""
-    def __init__(self, db_url="sqlite:///finance.db", echo=False):
+    def __init__(self, db_url="sqlite:///finance.db", echo=False, pool_size: int | None = None, max_overflow: int | None = None, pool_recycle: int | None = None, sqlite_pragmas: dict | None = None):
         """初始化資料庫連接
         
         Args:
             db_url: 資料庫連接字串
-            echo: 是否顯示 SQLAlchemy 執行的 SQL 語句"""
+            echo: 是否顯示 SQLAlchemy 執行的 SQL 語句
+            pool_size: 連線池常駐連線數（可選）
+            max_overflow: 連線池可額外建立的連線數（可選）
+            pool_recycle: 連線回收秒數（可選）
+            sqlite_pragmas: 每條 SQLite 連線建立時套用的 PRAGMA（見 resolve_sqlite_pragmas，可選）"""
         try:
-            self.engine = create_engine(db_url, echo=echo)
+            self.engine = create_engine(db_url, echo=echo, **self._pool_options(db_url, pool_size, max_overflow, pool_recycle))
+            if sqlite_pragmas and self.engine.dialect.name == "sqlite":
+                self._register_sqlite_pragmas(resolve_sqlite_pragmas(None, sqlite_pragmas))
             Base.metadata.create_all(self.engine)
-            Session = sessionmaker(bind=self.engine)
-            self.session = Session()
+            self._migrate_indexes()
+            self._has_version_triggers = self._install_version_triggers()
+            self._has_note_fts = self._install_note_fts()
+            # 每個執行緒各自持有一個 Session，由 remove_session() 在請求結束時歸還連線
+            self._session_factory = sessionmaker(bind=self.engine)
+            self.session = scoped_session(self._session_factory)
+            # 本程序每次寫入都遞增，供結果快取判斷資料是否變動
+            self._ledger_version = 0
+            self._ledger_version_lock = threading.Lock()
+            # 程序內共用的欄式快照，首次讀取時載入，之後由寫入方法增量維護
+            self.snapshot = LedgerSnapshot(lambda min_id: self.get_log_columns({"min_id": min_id} if min_id else None))
+            self._ensure_daily_summary()
         except Exception as e:
             print(f"初始化資料庫時發生錯誤：{str(e)}")
             raise
+
+    @staticmethod
+    def _pool_options(db_url: str, pool_size: int | None, max_overflow: int | None, pool_recycle: int | None) -> dict:
+        """依資料庫型態產生連線池參數（記憶體 SQLite 不使用 QueuePool，故略過）"""
+        url = make_url(db_url)
+        if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+            return {}
+        options = {"pool_pre_ping": True}
+        if pool_size is not None:
+            options["pool_size"] = pool_size
+        if max_overflow is not None:
+            options["max_overflow"] = max_overflow
+        if pool_recycle is not None:
+            options["pool_recycle"] = pool_recycle
+        return options
+
+    def _register_sqlite_pragmas(self, pragmas: dict):
+        """於每條新連線套用 PRAGMA（journal_mode 需最先設定）"""
+        ordered = sorted(pragmas.items(), key=lambda kv: kv[0] != "journal_mode")
+
+        @event.listens_for(self.engine, "connect")
+        def _apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                for key, value in ordered:
+                    cursor.execute(f"PRAGMA {key}={value}")
+            finally:
+                cursor.close()
+
+    def get_sqlite_pragmas(self) -> dict:
+        """查詢目前連線實際生效的 PRAGMA 值"""
+        if self.engine.dialect.name != "sqlite":
+            return {}
+        with self.engine.connect() as conn:
+            return {
+                key: conn.exec_driver_sql(f"PRAGMA {key}").scalar()
+                for key in ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store")
+            }
+
+    def _migrate_indexes(self):
+        """為既有資料庫補建缺少的索引（create_all 不會替已存在的資料表加索引）"""
+        for index in FinanceLog.__table__.indexes:
+            index.create(bind=self.engine, checkfirst=True)
+
+    def _ensure_daily_summary(self):
+        """既有資料庫首次升級時，從 finance_log 建立每日彙總"""
+        has_summary = self.session.query(DailySummary.id).first() is not None
+        has_logs = self.session.query(FinanceLog.id).first() is not None
+        if has_logs and not has_summary:
+            self.rebuild_daily_summary()
+        self.session.remove()
+
+    def _install_version_triggers(self) -> bool:
+        """建立 category 與 finance_log 的版本計數器；SQLite 以觸發器在任何寫入（含外部程式）時遞增
+
+        Returns:
+            bool: 是否已安裝觸發器（非 SQLite 資料庫無法偵測外部寫入）
+        """
+        with self.engine.begin() as conn:
+            for key in _VERSION_KEYS:
+                exists = conn.execute(text("SELECT 1 FROM ledger_meta WHERE key = :key"), {"key": key}).first()
+                if not exists:
+                    conn.execute(text("INSERT INTO ledger_meta (key, value) VALUES (:key, 0)"), {"key": key})
+            if self.engine.dialect.name != "sqlite":
+                return False
+            triggers = [(f"trg_category_version_{op.lower()}", op, "category", CATEGORY_VERSION_KEY)
+                        for op in ("INSERT", "UPDATE", "DELETE")]
+            triggers += [
+                ("trg_log_version_insert", "INSERT", "finance_log", LOG_INSERT_VERSION_KEY),
+                ("trg_log_version_update", "UPDATE", "finance_log", LOG_CHANGE_VERSION_KEY),
+                ("trg_log_version_delete", "DELETE", "finance_log", LOG_CHANGE_VERSION_KEY),
+            ]
+            for name, op, table, key in triggers:
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {op} ON {table} BEGIN "
+                    f"UPDATE ledger_meta SET value = value + 1 WHERE key = '{key}'; END"
+                ))
+        return True
+
+    def _install_note_fts(self) -> bool:
+        """SQLite 建立 finance_log.note 的 FTS5 (trigram) 影子索引，並以觸發器同步（含外部程式的寫入）
+
+        Returns:
+            bool: 是否可使用全文索引（非 SQLite 或未編譯 FTS5 時退回 LIKE）
+        """
+        if self.engine.dialect.name != "sqlite":
+            return False
+        try:
+            with self.engine.begin() as conn:
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": NOTE_FTS_TABLE}
+                ).first()
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {NOTE_FTS_TABLE} USING fts5("
+                    f"note, content='finance_log', content_rowid='id', tokenize='trigram')"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS trg_finance_log_fts_insert AFTER INSERT ON finance_log BEGIN "
+                    f"INSERT INTO {NOTE_FTS_TABLE} (rowid, note) VALUES (new.id, new.note); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS trg_finance_log_fts_delete AFTER DELETE ON finance_log BEGIN "
+                    f"INSERT INTO {NOTE_FTS_TABLE} ({NOTE_FTS_TABLE}, rowid, note) VALUES ('delete', old.id, old.note); END"
+                ))
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS trg_finance_log_fts_update AFTER UPDATE OF note ON finance_log BEGIN "
+                    f"INSERT INTO {NOTE_FTS_TABLE} ({NOTE_FTS_TABLE}, rowid, note) VALUES ('delete', old.id, old.note); "
+                    f"INSERT INTO {NOTE_FTS_TABLE} (rowid, note) VALUES (new.id, new.note); END"
+                ))
+                if not exists:
+                    # 既有資料庫首次建立索引時匯入現有備註
+                    conn.execute(text(f"INSERT INTO {NOTE_FTS_TABLE} ({NOTE_FTS_TABLE}) VALUES ('rebuild')"))
+        except OperationalError as e:
+            print(f"無法建立備註全文索引，改用 LIKE 搜尋：{str(e)}")
+            return False
+        return True
+
+    @property
+    def has_note_fts(self) -> bool:
+        """note 關鍵字搜尋是否使用全文索引"""
+        return self._has_note_fts
+
+    def _note_match_ids(self, terms: list[str]):
+        """全文索引中同時包含所有關鍵字的日誌 id 子查詢"""
+        return text(f"SELECT rowid FROM {NOTE_FTS_TABLE} WHERE {NOTE_FTS_TABLE} MATCH :note_match").bindparams(
+            note_match=" AND ".join(_fts_phrase(t) for t in terms)
+        ).columns(column("rowid", Integer))
+
+    def _note_keyword_condition(self, keyword: str):
+        """note 子字串條件：關鍵字夠長時走全文索引，否則退回 LIKE"""
+        if self._has_note_fts and len(keyword) >= NOTE_FTS_MIN_LENGTH:
+            return FinanceLog.id.in_(self._note_match_ids([keyword]))
+        return FinanceLog.note.ilike(f"%{keyword}%")
+
+    def get_category_version(self) -> int | None:
+        """取得 category 版本；無法偵測外部寫入時回傳 None"""
+        if not self._has_version_triggers:
+            return None
+        return self.session.query(LedgerMeta.value).filter_by(key=CATEGORY_VERSION_KEY).scalar()
+
+    def _read_versions(self) -> dict[str, int]:
+        """讀取 ledger_meta 中由觸發器維護的版本計數"""
+        return dict(self.session.query(LedgerMeta.key, LedgerMeta.value).filter(LedgerMeta.key.in_(_VERSION_KEYS)).all())
+
+    def get_log_version(self) -> LedgerVersion:
+        """finance_log 的資料版本；非 SQLite 只能以本程序的寫入次數偵測新增"""
+        if not self._has_version_triggers:
+            return LedgerVersion(self._ledger_version, None)
+        versions = self._read_versions()
+        return LedgerVersion(versions[LOG_INSERT_VERSION_KEY], versions[LOG_CHANGE_VERSION_KEY])
+
+    @property
+    def ledger_version(self) -> tuple:
+        """帳本版本，任何寫入成功後改變；SQLite 另含觸發器計數，外部程式的寫入也會改變版本"""
+        if not self._has_version_triggers:
+            return (self._ledger_version,)
+        versions = self._read_versions()
+        return (self._ledger_version, *(versions[key] for key in _VERSION_KEYS))
+
+    def _bump_ledger_version(self):
+        with self._ledger_version_lock:
+            self._ledger_version += 1
+
+    def remove_session(self):
+        """釋放目前執行緒的 Session 並將連線歸還連線池"""
+        self.session.remove()
+
     def close(self):
         """關閉資料庫連接"""
-        self.session.close()
+        self.session.remove()
         self.engine.dispose()
+    # DailySummary (每日彙總維護)
+    def _add_to_daily_summary(self, rows):
+        """把新增的日誌累加進每日彙總（在目前交易內執行，由呼叫端 commit）
+
+        Args:
+            rows: (timestamp, category_id, actual_type, amount) 的可迭代物件
+        """
+        groups = {}
+        for ts, category_id, actual_type, amount in rows:
+            if ts is None or amount is None:
+                continue
+            key = (ts.date(), category_id, actual_type)
+            total, count, low, high = groups.get(key, (0.0, 0, amount, amount))
+            groups[key] = (total + amount, count + 1, min(low, amount), max(high, amount))
+
+        if not groups:
+            return
+        if self.engine.dialect.name in ("sqlite", "postgresql"):
+            # 整批以一次 executemany 的 INSERT ... ON CONFLICT DO UPDATE 累加
+            self.session.execute(self._daily_summary_upsert(), [
+                {"day": day, "category_id": category_id, "actual_type": actual_type,
+                 "total": total, "count": count, "min_amount": low, "max_amount": high}
+                for (day, category_id, actual_type), (total, count, low, high) in groups.items()
+            ])
+            return
+
+        for (day, category_id, actual_type), (total, count, low, high) in groups.items():
+            result = self.session.execute(
+                update(DailySummary)
+                .where(
+                    DailySummary.day == day,
+                    DailySummary.category_id == category_id,
+                    DailySummary.actual_type == actual_type
+                )
+                .values(
+                    total=DailySummary.total + total,
+                    count=DailySummary.count + count,
+                    min_amount=case((DailySummary.min_amount <= low, DailySummary.min_amount), else_=low),
+                    max_amount=case((DailySummary.max_amount >= high, DailySummary.max_amount), else_=high)
+                )
+            )
+            if result.rowcount == 0:
+                self.session.execute(insert(DailySummary).values(
+                    day=day, category_id=category_id, actual_type=actual_type,
+                    total=total, count=count, min_amount=low, max_amount=high
+                ))
+
+    def _daily_summary_upsert(self):
+        """daily_summary 的累加 upsert 語句（SQLite / PostgreSQL）"""
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        table = DailySummary.__table__
+        stmt = dialect_insert(table)
+        new = stmt.excluded
+        return stmt.on_conflict_do_update(
+            index_elements=[table.c.day, table.c.category_id, table.c.actual_type],
+            set_={
+                "total": table.c.total + new.total,
+                "count": table.c.count + new.count,
+                "min_amount": case((table.c.min_amount <= new.min_amount, table.c.min_amount), else_=new.min_amount),
+                "max_amount": case((table.c.max_amount >= new.max_amount, table.c.max_amount), else_=new.max_amount),
+            }
+        )
+
+    def _refresh_daily_summary(self, start_day: date | None = None, end_day: date | None = None):
+        """由 finance_log 重新計算 [start_day, end_day] 的每日彙總（在目前交易內執行，由呼叫端 commit）"""
+        day = func.date(FinanceLog.timestamp)
+        clear = delete(DailySummary)
+        source = (
+            select(
+                day,
+                FinanceLog.category_id,
+                FinanceLog.actual_type,
+                func.sum(FinanceLog.amount),
+                func.count(FinanceLog.id),
+                func.min(FinanceLog.amount),
+                func.max(FinanceLog.amount)
+            )
+            .where(FinanceLog.timestamp.is_not(None), FinanceLog.amount.is_not(None))
+            .group_by(day, FinanceLog.category_id, FinanceLog.actual_type)
+        )
+        if start_day is not None:
+            clear = clear.where(DailySummary.day >= start_day)
+            source = source.where(FinanceLog.timestamp >= _day_start(start_day))
+        if end_day is not None:
+            clear = clear.where(DailySummary.day <= end_day)
+            source = source.where(FinanceLog.timestamp < _day_start(end_day + timedelta(days=1)))
+
+        self.session.flush()
+        self.session.execute(clear)
+        self.session.execute(insert(DailySummary).from_select(
+            ["day", "category_id", "actual_type", "total", "count", "min_amount", "max_amount"],
+            source
+        ))
+
+    def rebuild_daily_summary(self) -> int:
+        """從 finance_log 完整重建每日彙總
+
+        Returns:
+            int: 彙總列數
+        """
+        try:
+            self._refresh_daily_summary()
+            self.session.commit()
+            self.snapshot.invalidate()
+            self._bump_ledger_version()
+            return self.session.query(func.count(DailySummary.id)).scalar()
+        except Exception:
+            self.session.rollback()
+            raise
+
     # Category (CRUD)
     def create_category(self, name: str, default_type: Direction) -> Category:
         """建立新類別"""
@@ -61,6 +509,7 @@ class FinanceDB:
             cat = Category(name=name, default_type=default_type)
             self.session.add(cat)
             self.session.commit()
+            self._bump_ledger_version()
             return cat
         except Exception:
             self.session.rollback()
@@ -80,7 +529,11 @@ class FinanceDB:
             if not cat:
                 return False
             self.session.delete(cat)
+            # 類別刪除會連帶刪除日誌，同步移除其彙總
+            self.session.execute(delete(DailySummary).where(DailySummary.category_id == category_id))
             self.session.commit()
+            self.snapshot.invalidate()
+            self._bump_ledger_version()
             return True
         except Exception:
             self.session.rollback()
@@ -100,20 +553,73 @@ class FinanceDB:
             ts = timestamp or datetime.utcnow()
             log = FinanceLog(category_id=category_id, actual_type=actual_type, amount=amount, note=note, timestamp=ts)
             self.session.add(log)
+            self._add_to_daily_summary([(ts, category_id, actual_type, amount)])
             self.session.commit()
+            self._bump_ledger_version()
+            self._extend_snapshot()
             self.session.refresh(log)
             return log
         except Exception:
             self.session.rollback()
             raise
+
+    def create_logs_bulk(self, rows: list[dict]) -> int:
+        """在單一交易中以 executemany 批次新增日誌
+
+        Args:
+            rows: 欄位同 FinanceLog 的字典清單（category_id, actual_type, amount, note, timestamp）
+        Returns:
+            int: 新增筆數
+        """
+        if not rows:
+            return 0
+        try:
+            self.session.execute(insert(FinanceLog), rows)
+            self._add_to_daily_summary(
+                (r.get("timestamp"), r.get("category_id"), r.get("actual_type"), r.get("amount")) for r in rows
+            )
+            self.session.commit()
+            self._bump_ledger_version()
+            self._extend_snapshot()
+            return len(rows)
+        except Exception:
+            self.session.rollback()
+            raise
+
+    def _lock_log(self, log_id: int) -> FinanceLog | None:
+        """先取得寫入鎖再讀取日誌，避免並行的修改/刪除依過期的舊日期同步彙總
+
+        以不改變內容的 UPDATE 開始交易：SQLite 取得整個資料庫的寫入鎖，其他資料庫鎖定該列
+        """
+        self.session.execute(
+            update(FinanceLog).where(FinanceLog.id == log_id).values(id=FinanceLog.id),
+            execution_options={"synchronize_session": False}
+        )
+        return self.session.query(FinanceLog).populate_existing().filter_by(id=log_id).first()
+
+    def _extend_snapshot(self):
+        """新增日誌後把新資料列附加到已載入的快照（寫入已提交，讀取版本失敗時改在下次讀取時重新載入）"""
+        if not self.snapshot.loaded:
+            return
+        try:
+            self.snapshot.extend(self.get_log_version())
+        except Exception:
+            self.snapshot.invalidate()
+
     def delete_log_by_id(self, log_id: int) -> bool:
         """刪除指定ID的日誌 (新增)"""
         try:
-            log = self.session.query(FinanceLog).filter_by(id=log_id).first()
+            log = self._lock_log(log_id)
             if not log:
+                self.session.rollback()
                 return False
+            day = log.timestamp.date() if log.timestamp else None
             self.session.delete(log)
+            if day:
+                self._refresh_daily_summary(day, day)
             self.session.commit()
+            self.snapshot.invalidate()
+            self._bump_ledger_version()
             return True
         except Exception:
             self.session.rollback()
@@ -126,44 +632,407 @@ class FinanceDB:
         except Exception:
             raise
 
-    def get_logs_with_sorting(self, sort_by: SortField = SortField.TIMESTAMP, reverse: bool = True, filters: dict | None = None) -> list[FinanceLog]:
-        """取得排序後的日誌（支援多重條件過濾）
+    def _apply_log_filters(self, query, filters: dict | None):
+        """套用 get_logs_with_sorting 支援的過濾條件"""
+        if not filters:
+            return query
+        if 'category_id' in filters:
+            query = query.filter(FinanceLog.category_id == filters['category_id'])
+        if 'actual_type' in filters:
+            query = query.filter(FinanceLog.actual_type == filters['actual_type'])
+        if 'min_amount' in filters:
+            query = query.filter(FinanceLog.amount >= filters['min_amount'])
+        if 'max_amount' in filters:
+            query = query.filter(FinanceLog.amount <= filters['max_amount'])
+        if 'start_date' in filters:
+            query = query.filter(FinanceLog.timestamp >= filters['start_date'])
+        if 'end_date' in filters:
+            query = query.filter(FinanceLog.timestamp <= filters['end_date'])
+        if 'before_date' in filters:
+            query = query.filter(FinanceLog.timestamp < filters['before_date'])
+        if 'note_keyword' in filters:
+            query = query.filter(self._note_keyword_condition(filters['note_keyword']))
+        if 'ids' in filters:
+            query = query.filter(FinanceLog.id.in_(filters['ids']))
+        if 'min_id' in filters:
+            query = query.filter(FinanceLog.id >= filters['min_id'])
+        return query
+
+    @staticmethod
+    def _apply_log_ordering(query, sort_by: SortField, reverse: bool, after: tuple | None = None):
+        """依排序欄位排序，並以 id 作為次要排序確保順序穩定
+
+        after 為 (排序欄位值, id) 的 keyset 游標；只回傳排在該筆之後、且排序欄位非 NULL 的資料，
+        條件寫成 col <= v AND (col < v OR id < last) 以便走索引範圍掃描。
+        NULL 一律排在最後：游標值為 NULL 時只讀 NULL 的資料列（id 為 None 表示從頭讀），
+        游標值非 NULL 時 NULL 的資料列由 _fetch_keyset 另外接續讀取。
+        """
+        sort_column = getattr(FinanceLog, sort_by.value)
+        if after is not None:
+            value, last_id = after
+            if value is None:
+                query = query.filter(sort_column.is_(None))
+                if last_id is not None:
+                    query = query.filter(FinanceLog.id < last_id if reverse else FinanceLog.id > last_id)
+            elif reverse:
+                query = query.filter(sort_column <= value, or_(sort_column < value, FinanceLog.id < last_id))
+            else:
+                query = query.filter(sort_column >= value, or_(sort_column > value, FinanceLog.id > last_id))
+        if reverse:
+            return query.order_by(sort_column.desc().nulls_last(), FinanceLog.id.desc())
+        return query.order_by(sort_column.asc().nulls_last(), FinanceLog.id.asc())
+
+    def _sorted_log_query(self, query, sort_by: SortField, reverse: bool, filters: dict | None, limit: int | None, offset: int | None, after: tuple | None):
+        """在 query 上套用過濾、排序與分頁"""
+        query = self._apply_log_filters(query, filters)
+        query = self._apply_log_ordering(query, sort_by, reverse, after)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None and limit > 0:
+            query = query.limit(limit)
+        return query
+
+    def _fetch_keyset(self, query, sort_by: SortField, reverse: bool, filters: dict | None, limit: int | None, offset: int | None, after: tuple | None, run=None) -> list:
+        """執行排序分頁查詢；游標值非 NULL 且本頁未滿時，再以 IS NULL 條件接續讀取排在最後的 NULL 資料列
+
+        Args:
+            run: 執行查詢的函式（預設為 query.all()）
+        """
+        run = run or (lambda q: q.all())
+        rows = run(self._sorted_log_query(query, sort_by, reverse, filters, limit, offset, after))
+        has_limit = limit is not None and limit > 0
+        if after is None or after[0] is None or (has_limit and len(rows) >= limit):
+            return rows
+        if offset and not rows:
+            # 非 NULL 的部分不足 offset 筆，剩下的 offset 由 NULL 部分扣除
+            skipped = self._sorted_log_query(query, sort_by, reverse, filters, None, None, after).order_by(None).count()
+            offset = max(0, offset - skipped)
+        else:
+            offset = None
+        remaining = limit - len(rows) if has_limit else None
+        return rows + run(self._sorted_log_query(query, sort_by, reverse, filters, remaining, offset, (None, None)))
+
+    def get_logs_with_sorting(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: tuple | None = None
+    ) -> list[FinanceLog]:
+        """取得排序後的日誌（支援多重條件過濾與分頁）
         
         Args:
             sort_by: 排序欄位（SortField 列舉）
             reverse: 是否降序排列
             filters: 過濾條件字典
+            limit: 限制回傳筆數（可選，於 SQL 中套用）
+            offset: 略過前 N 筆（可選）
+            after: keyset 游標 (排序欄位值, id)，只回傳排在其後的資料（可選）
         """
         try:
-            # 基礎查詢
-            query = self.session.query(FinanceLog)
-
-            # 套用過濾條件
-            if filters:
-                if 'category_id' in filters:
-                    query = query.filter(FinanceLog.category_id == filters['category_id'])
-                if 'actual_type' in filters:
-                    query = query.filter(FinanceLog.actual_type == filters['actual_type'])
-                if 'min_amount' in filters:
-                    query = query.filter(FinanceLog.amount >= filters['min_amount'])
-                if 'max_amount' in filters:
-                    query = query.filter(FinanceLog.amount <= filters['max_amount'])
-                if 'start_date' in filters:
-                    query = query.filter(FinanceLog.timestamp >= filters['start_date'])
-                if 'end_date' in filters:
-                    query = query.filter(FinanceLog.timestamp <= filters['end_date'])
-                if 'note_keyword' in filters:
-                    query = query.filter(FinanceLog.note.ilike(f"%{filters['note_keyword']}%"))
-
-            # 排序
-            sort_column = getattr(FinanceLog, sort_by.value)
-            query = query.order_by(sort_column.desc() if reverse else sort_column.asc())
+            return self._fetch_keyset(self.session.query(FinanceLog), sort_by, reverse, filters, limit, offset, after)
+        except Exception as e:
+            print(f"排序查詢時發生錯誤：{str(e)}")
+            raise
 
-            return query.all()
+    def get_log_rows_with_sorting(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: tuple | None = None
+    ) -> list[tuple]:
+        """同 get_logs_with_sorting，但只查詢需要的欄位並一次 JOIN 類別名稱
+
+        回傳 tuple，欄位順序同 LOG_ROW_COLUMNS，不建立 ORM 物件，
+        適合大量讀取（避免逐筆延遲載入 category 與 identity map 開銷）。
+        """
+        try:
+            query = self.session.query(*LOG_ROW_COLUMNS).outerjoin(Category, FinanceLog.category_id == Category.id)
+            return self._fetch_keyset(query, sort_by, reverse, filters, limit, offset, after)
         except Exception as e:
             print(f"排序查詢時發生錯誤：{str(e)}")
             raise
 
+    def get_log_rows_with_balance(self,
+        reverse: bool = True,
+        filters: dict | None = None,
+        limit: int | None = None,
+        offset: int | None = None,
+        after: tuple | None = None
+    ) -> list[tuple]:
+        """依時間排序取得投影日誌，並附上累計淨額（收入為正、支出為負）
+
+        頁內以 SUM() OVER (ORDER BY timestamp, id) 計算，再加上本頁最早一筆之前的淨額作為起始值，
+        因此分頁或游標翻頁的結果都與完整清單一致。
+        日期條件只決定顯示哪些資料列，累計淨額仍從帳本起點算起（其餘過濾條件照常套用）。
+
+        Returns:
+            list[tuple]: LOG_ROW_COLUMNS 的欄位加上累計淨額
+        """
+        try:
+            query = self.session.query(*LOG_ROW_COLUMNS, SIGNED_AMOUNT.label("signed_amount"))
+            query = query.outerjoin(Category, FinanceLog.category_id == Category.id)
+
+            def windowed(page_query):
+                page = page_query.subquery()
+                columns = [c for c in page.c if c.name != "signed_amount"]
+                # 沒有時間的資料列無法排入帳本順序，不計入累計
+                signed = case((page.c.timestamp.is_(None), 0.0), else_=page.c.signed_amount)
+                running = func.sum(signed).over(order_by=(page.c.timestamp, page.c.id))
+                order = (page.c.timestamp.desc().nulls_last(), page.c.id.desc()) if reverse else (page.c.timestamp.asc().nulls_last(), page.c.id.asc())
+                return self.session.query(*columns, running).order_by(*order).all()
+
+            rows = self._fetch_keyset(query, SortField.TIMESTAMP, reverse, filters, limit, offset, after, run=windowed)
+            dated = [row for row in rows if row[-2] is not None]
+            if not dated:
+                return [(*row[:-1], None) for row in rows]
+
+            log_id, *_, timestamp, _ = dated[-1] if reverse else dated[0]
+            start = self._net_before(filters, timestamp, log_id)
+            return [(*row[:-1], start + (row[-1] or 0.0) if row[-2] is not None else None) for row in rows]
+        except Exception as e:
+            print(f"累計淨額查詢時發生錯誤：{str(e)}")
+            raise
+
+    def _net_before(self, filters: dict | None, timestamp: datetime, log_id: int) -> float:
+        """(timestamp, id) 之前所有日誌的淨額（忽略日期條件）
+
+        完整的日子讀 daily_summary，成本與之前的歷史資料量無關。
+        """
+        base = {k: v for k, v in (filters or {}).items() if k not in ("start_date", "end_date", "before_date")}
+        signs = {Direction.Income: 1.0, Direction.Expenditure: -1.0}
+        net = 0.0
+        # timestamp 精度為微秒，end_date 取前 1 微秒即為「早於 timestamp」，且可走 daily_summary
+        before = {**base, "end_date": timestamp - timedelta(microseconds=1)}
+        for actual_type, total, _, _ in self.get_log_aggregates(("actual_type",), before):
+            net += signs.get(actual_type, 0.0) * (total or 0.0)
+        # 同一時間戳記中 id 較小者也排在前面
+        ties = self._apply_log_filters(self.session.query(func.sum(SIGNED_AMOUNT)), base).filter(
+            FinanceLog.timestamp == timestamp, FinanceLog.id < log_id
+        ).scalar()
+        return net + (ties or 0.0)
+
+    def get_daily_balance(self, category_id: int | None = None, start_day: date | None = None, end_day: date | None = None) -> tuple[float, list[tuple]]:
+        """從 daily_summary 以視窗函數計算每日淨額與累計淨額
+
+        Returns:
+            tuple: (start_day 之前的累計淨額, [(日期, 當日淨額, 累計淨額), ...])
+        """
+        try:
+            net = func.sum(case(
+                (DailySummary.actual_type == Direction.Income, DailySummary.total),
+                (DailySummary.actual_type == Direction.Expenditure, -DailySummary.total),
+                else_=0.0
+            ))
+            scope = []
+            if category_id is not None:
+                scope.append(DailySummary.category_id == category_id)
+
+            opening = 0.0
+            if start_day is not None:
+                opening = self.session.query(net).filter(*scope, DailySummary.day < start_day).scalar() or 0.0
+
+            days = self.session.query(DailySummary.day.label("day"), net.label("net")).filter(*scope)
+            if start_day is not None:
+                days = days.filter(DailySummary.day >= start_day)
+            if end_day is not None:
+                days = days.filter(DailySummary.day <= end_day)
+            days = days.group_by(DailySummary.day).subquery()
+            rows = self.session.query(
+                days.c.day,
+                days.c.net,
+                func.sum(days.c.net).over(order_by=days.c.day)
+            ).order_by(days.c.day).all()
+            return opening, [(day, day_net, opening + running) for day, day_net, running in rows]
+        except Exception as e:
+            print(f"累計淨額查詢時發生錯誤：{str(e)}")
+            raise
+
+    def iter_log_rows(self,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        filters: dict | None = None,
+        batch_size: int = 1000
+    ):
+        """以伺服器端游標 (yield_per) 逐批產生投影日誌 tuple，記憶體用量與結果大小無關
+
+        使用獨立的 Session，可跨執行緒逐步迭代（例如 StreamingResponse），迭代結束即關閉。
+        """
+        session = self._session_factory()
+        try:
+            query = session.query(*LOG_ROW_COLUMNS).outerjoin(Category, FinanceLog.category_id == Category.id)
+            query = self._sorted_log_query(query, sort_by, reverse, filters, None, None, None)
+            yield from query.yield_per(batch_size)
+        finally:
+            session.close()
+
+    def search_log_rows(self, terms: list[str], filters: dict | None = None, limit: int | None = 50) -> list[tuple]:
+        """依備註關鍵字搜尋，依相關度排序
+
+        長度足夠的關鍵字以全文索引比對並以 bm25 計分，較短的關鍵字（或無全文索引時）以 LIKE 過濾；
+        沒有可計分的關鍵字時依時間由新到舊排序。
+
+        Args:
+            terms: 關鍵字（須全部符合）
+            filters: 其他過濾條件（同 get_logs_with_sorting）
+            limit: 最多回傳筆數
+        Returns:
+            list[tuple]: LOG_ROW_COLUMNS 的欄位加上相關度分數（越大越相關，無分數時為 None）
+        """
+        try:
+            fts_terms = [t for t in terms if self._has_note_fts and len(t) >= NOTE_FTS_MIN_LENGTH]
+            like_terms = [t for t in terms if t not in fts_terms]
+            if fts_terms:
+                matches = text(
+                    f"SELECT rowid, -bm25({NOTE_FTS_TABLE}) AS score FROM {NOTE_FTS_TABLE} "
+                    f"WHERE {NOTE_FTS_TABLE} MATCH :note_match"
+                ).bindparams(
+                    note_match=" AND ".join(_fts_phrase(t) for t in fts_terms)
+                ).columns(column("rowid", Integer), column("score", Float)).subquery("note_match")
+                query = self.session.query(*LOG_ROW_COLUMNS, matches.c.score).join(matches, matches.c.rowid == FinanceLog.id)
+                order = (matches.c.score.desc(), FinanceLog.timestamp.desc(), FinanceLog.id.desc())
+            else:
+                query = self.session.query(*LOG_ROW_COLUMNS, type_coerce(None, Float))
+                order = (FinanceLog.timestamp.desc(), FinanceLog.id.desc())
+            query = query.outerjoin(Category, FinanceLog.category_id == Category.id)
+            for term in like_terms:
+                query = query.filter(FinanceLog.note.ilike(f"%{term}%"))
+            query = self._apply_log_filters(query, filters).order_by(*order)
+            if limit is not None and limit > 0:
+                query = query.limit(limit)
+            return query.all()
+        except Exception as e:
+            print(f"搜尋時發生錯誤：{str(e)}")
+            raise
+
+    def get_log_columns(self, filters: dict | None = None) -> dict[str, np.ndarray]:
+        """以緊湊型別欄位陣列取得日誌（依 (timestamp, id) 排序），供欄式快照與向量化分析使用
+
+        Returns:
+            dict: 欄位同 SNAPSHOT_COLUMNS（id、timestamp、amount、category_id、direction）
+        """
+        try:
+            direction = case(
+                *((FinanceLog.actual_type == d, code) for d, code in DIRECTION_CODES.items()),
+                else_=-1
+            )
+            query = select(
+                FinanceLog.id,
+                # SQLite 直接取回 ISO 字串交給 NumPy 解析，不逐列建立 datetime 物件
+                type_coerce(FinanceLog.timestamp, String),
+                func.coalesce(FinanceLog.amount, 0.0),
+                func.coalesce(FinanceLog.category_id, -1),
+                direction
+            )
+            # 以 Core select 取回 tuple 並在 NumPy 排序，省去 ORM 列處理與資料庫端排序
+            query = self._apply_log_filters(query, filters)
+            rows = self.session.connection().execute(query).all()
+            columns = zip(*rows) if rows else ((),) * len(SNAPSHOT_COLUMNS)
+            result = {
+                name: np.array(values, dtype=dtype)
+                for (name, dtype), values in zip(SNAPSHOT_COLUMNS.items(), columns)
+            }
+            order = np.lexsort((result["id"], result["timestamp"]))
+            return {name: values[order] for name, values in result.items()}
+        except Exception as e:
+            print(f"欄位查詢時發生錯誤：{str(e)}")
+            raise
+
+    def get_ledger_view(self, start_date: datetime | None = None, end_date: datetime | None = None) -> LedgerView:
+        """從欄式快照取得時間區間切片（首次呼叫時載入快照，資料版本改變時補上新資料或重新載入）"""
+        return self.snapshot.view(self.get_log_version(), start_date, end_date)
+
+    def get_log_aggregates(self, group_by: tuple[str, ...] = (), filters: dict | None = None) -> list[tuple]:
+        """以 GROUP BY 在資料庫端彙總日誌金額
+        
+        只有類別/方向/日期條件時，完整的日子讀 daily_summary，頭尾不足一天的部分才掃描 finance_log。
+        
+        Args:
+            group_by: 分組欄位名稱（AGGREGATE_GROUP_COLUMNS 的鍵）
+            filters: 過濾條件字典（同 get_logs_with_sorting）
+        Returns:
+            list[tuple]: (分組欄位值..., 合計, 筆數, 平均)
+        """
+        try:
+            filters = dict(filters or {})
+            # 與 daily_summary 的日期比較前，含時區的邊界先轉為不含時區的 UTC
+            for key in ("start_date", "end_date", "before_date"):
+                if filters.get(key) is not None:
+                    filters[key] = to_naive_utc(filters[key])
+            if set(filters) <= ROLLUP_FILTER_KEYS:
+                return self._get_rollup_aggregates(group_by, filters)
+            return self._get_raw_aggregates(group_by, filters)
+        except Exception as e:
+            print(f"彙總查詢時發生錯誤：{str(e)}")
+            raise
+
+    def _get_raw_aggregates(self, group_by: tuple[str, ...], filters: dict | None) -> list[tuple]:
+        """直接從 finance_log 彙總"""
+        columns = [AGGREGATE_GROUP_COLUMNS[g] for g in group_by]
+        query = self.session.query(
+            *columns,
+            func.sum(FinanceLog.amount),
+            func.count(FinanceLog.id),
+            func.avg(FinanceLog.amount)
+        )
+        if "category" in group_by:
+            query = query.outerjoin(Category, FinanceLog.category_id == Category.id)
+        query = self._apply_log_filters(query, filters)
+        if columns:
+            query = query.group_by(*columns)
+        return query.all()
+
+    def _get_rollup_aggregates(self, group_by: tuple[str, ...], filters: dict) -> list[tuple]:
+        """完整日子讀 daily_summary，頭尾不完整的時段讀 finance_log，再合併"""
+        start, end = filters.get("start_date"), filters.get("end_date")
+        # [first_day, last_day_excl) 為完整包含在區間內的日子
+        first_day = None
+        if start is not None:
+            first_day = start.date() if start == _day_start(start.date()) else start.date() + timedelta(days=1)
+        last_day_excl = end.date() if end is not None else None
+        if first_day is not None and last_day_excl is not None and first_day >= last_day_excl:
+            return self._get_raw_aggregates(group_by, filters)
+
+        merged = {}
+        def merge(rows):
+            for *keys, total, count in rows:
+                if not count:
+                    continue
+                acc = merged.setdefault(tuple(keys), [0.0, 0])
+                acc[0] += total or 0.0
+                acc[1] += count
+
+        columns = [ROLLUP_GROUP_COLUMNS[g] for g in group_by]
+        query = self.session.query(*columns, func.sum(DailySummary.total), func.sum(DailySummary.count))
+        if "category" in group_by:
+            query = query.outerjoin(Category, DailySummary.category_id == Category.id)
+        if "category_id" in filters:
+            query = query.filter(DailySummary.category_id == filters["category_id"])
+        if "actual_type" in filters:
+            query = query.filter(DailySummary.actual_type == filters["actual_type"])
+        if first_day is not None:
+            query = query.filter(DailySummary.day >= first_day)
+        if last_day_excl is not None:
+            query = query.filter(DailySummary.day < last_day_excl)
+        if columns:
+            query = query.group_by(*columns)
+        merge(query.all())
+
+        base = {k: v for k, v in filters.items() if k not in ("start_date", "end_date")}
+        if start is not None and start < _day_start(first_day):
+            head = self._get_raw_aggregates(group_by, {**base, "start_date": start, "before_date": _day_start(first_day)})
+            merge(row[:-1] for row in head)
+        if end is not None:
+            tail = self._get_raw_aggregates(group_by, {**base, "start_date": _day_start(last_day_excl), "end_date": end})
+            merge(row[:-1] for row in tail)
+
+        if not group_by and not merged:
+            return [(None, 0, None)]  # 與未分組的 SQL 彙總一致：無資料時仍回傳一列
+        return [(*keys, total, count, total / count) for keys, (total, count) in merged.items()]
+
     def update_category(self, category_id: int, name: str | None = None, default_type: Direction | None = None) -> Category | None:
         """修改類別
         
@@ -191,6 +1060,7 @@ class FinanceDB:
                 cat.default_type = default_type
                 
             self.session.commit()
+            self._bump_ledger_version()
             return cat
         except Exception:
             self.session.rollback()
@@ -215,9 +1085,11 @@ class FinanceDB:
             timestamp: 新時間戳記（可選）
         """
         try:
-            log = self.session.query(FinanceLog).filter_by(id=log_id).first()
+            log = self._lock_log(log_id)
             if not log:
+                self.session.rollback()
                 return None
+            old_day = log.timestamp.date() if log.timestamp else None
 
             if category_id is not None:
                 # 確認類別存在
@@ -237,24 +1109,72 @@ class FinanceDB:
                 
             if timestamp is not None:
                 log.timestamp = timestamp
+
+            # 同步舊日期與新日期的彙總
+            new_day = log.timestamp.date() if log.timestamp else None
+            for day in {old_day, new_day} - {None}:
+                self._refresh_daily_summary(day, day)
                 
             self.session.commit()
-            # refresh to populate relationship
-            self.session.refresh(log)
-            return log
+            self.snapshot.invalidate()
+            self._bump_ledger_version()
+            # 重新讀取以載入關聯；提交後若已被其他請求刪除則回傳 None
+            return self.session.query(FinanceLog).filter_by(id=log_id).first()
         except Exception:
             self.session.rollback()
             raise
 
+class CachedCategory(NamedTuple):
+    """FinanceService 類別快取的項目"""
+    id: int
+    name: str
+    default_type: Direction
+
 class FinanceService:
     """邏輯層：使用 FinanceDB 提供高階功能，處理商業邏輯並回傳格式化資料"""
-    def __init__(self, db: FinanceDB):
+    def __init__(self, db: FinanceDB, max_workers: int = 8, category_cache_ttl: float = 5.0, report_cache_size: int = 128, report_cache_ttl: float = 300.0):
+        """
+        Args:
+            db: 資料層實例
+            max_workers: 執行阻塞資料庫操作的工作執行緒上限
+            category_cache_ttl: 類別快取多久（秒）檢查一次資料庫版本
+            report_cache_size: 報表結果快取的最大筆數（0 表示停用）
+            report_cache_ttl: 報表結果快取存活秒數
+        """
         self.db = db
+        # 報表結果快取，鍵值需包含 db.ledger_version
+        self.report_cache = ResultCache(report_cache_size, report_cache_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="finance-db")
+        # 類別快取 (name -> CachedCategory)，本程序的寫入直接更新，外部寫入由版本號偵測
+        self.category_cache_ttl = category_cache_ttl
+        self._category_lock = threading.Lock()
+        self._categories: dict[str, CachedCategory] | None = None
+        self._category_version: int | None = None
+        self._category_checked = 0.0
 
     def close(self):
         """關閉資料庫連接"""
+        self._executor.shutdown(wait=False)
         self.db.close()
 
+    def _call_in_session(self, func, *args, **kwargs):
+        """在工作執行緒中執行 func，結束後釋放該執行緒的 Session"""
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.db.remove_session()
+
+    async def run(self, func, *args, **kwargs):
+        """將阻塞的資料庫操作交給工作執行緒池執行，避免卡住 event loop
+
+        用法: await service.run(service.get_all_categories)
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            functools.partial(self._call_in_session, func, *args, **kwargs)
+        )
+
     def _log_to_dict(self, l: FinanceLog) -> dict:
         """轉換日誌為字典格式"""
         return {
@@ -267,6 +1187,63 @@ class FinanceService:
             "timestamp": (l.timestamp.isoformat() if l.timestamp else None),
         }
 
+    @staticmethod
+    def _row_to_dict(row: tuple) -> dict:
+        """轉換投影查詢的 tuple 為與 _log_to_dict 相同的字典格式"""
+        log_id, category_id, category, actual_type, amount, note, timestamp = row
+        return {
+            "id": log_id,
+            "category_id": category_id,
+            "category": category,
+            "actual_type": (actual_type.value if actual_type else None),
+            "amount": amount,
+            "note": note,
+            "timestamp": (timestamp.isoformat() if timestamp else None),
+        }
+
+    # Category 快取
+    def _load_categories(self) -> dict[str, CachedCategory]:
+        """確保類別快取有效並回傳（呼叫端需持有 _category_lock）"""
+        now = time.monotonic()
+        if self._categories is not None and now - self._category_checked < self.category_cache_ttl:
+            return self._categories
+        version = self.db.get_category_version()
+        if self._categories is None or version is None or version != self._category_version:
+            self._categories = {
+                c.name: CachedCategory(c.id, c.name, c.default_type) for c in self.db.get_all_categories()
+            }
+            self._category_version = version
+        self._category_checked = now
+        return self._categories
+
+    def _get_cached_category(self, name: str) -> CachedCategory | None:
+        """從快取以名稱查詢類別"""
+        with self._category_lock:
+            return self._load_categories().get(name)
+
+    def _apply_category_write(self, removed: str | None = None, added: CachedCategory | None = None):
+        """將本程序的類別寫入同步到快取
+
+        若版本號只因這次寫入 +1 則沿用快取，否則代表期間有外部寫入，下次讀取時整批重載。
+        """
+        with self._category_lock:
+            if self._categories is None:
+                return
+            if removed is not None:
+                self._categories.pop(removed, None)
+            if added is not None:
+                self._categories[added.name] = added
+            version = self.db.get_category_version()
+            if version is not None and self._category_version is not None and version == self._category_version + 1:
+                self._category_version = version
+            else:
+                self._categories = None
+
+    def invalidate_category_cache(self):
+        """清除類別快取，下次讀取時重新載入"""
+        with self._category_lock:
+            self._categories = None
+
     # Category 高階功能
     def add_category(self, name: str, default_type: Direction) -> dict:
         """新增類別（高階功能）"""
@@ -274,25 +1251,33 @@ class FinanceService:
             raise ValueError("name 必須為非空字串")
         if not isinstance(default_type, Direction):
             raise ValueError("default_type 必須為 Direction")
-        if self.db.get_category_by_name(name):
+        if self._get_cached_category(name):
             raise ValueError("category 已存在")
         cat = self.db.create_category(name, default_type)
+        self._apply_category_write(added=CachedCategory(cat.id, cat.name, cat.default_type))
         return {"id": cat.id, "name": cat.name, "default_type": cat.default_type.value}
 
     def delete_category(self, name: str) -> bool:
         """刪除類別（高階功能）"""
-        cat = self.db.get_category_by_name(name)
+        cat = self._get_cached_category(name)
         if not cat:
             return False
-        return self.db.delete_category_by_id(cat.id)
+        deleted = self.db.delete_category_by_id(cat.id)
+        if deleted:
+            self._apply_category_write(removed=name)
+        else:
+            self.invalidate_category_cache()
+        return deleted
 
     def get_all_categories(self) -> list[dict]:
         """取得所有類別（高階功能）"""
-        cats = self.db.get_all_categories()
+        with self._category_lock:
+            cats = sorted(self._load_categories().values(), key=lambda c: c.name)
         return [{"id": c.id, "name": c.name, "default_type": c.default_type.value} for c in cats]
     # Log 高階功能
-    def add_log(self, category_name: str, amount: float, actual_type: Direction | None = None, note: str | None = None, actuall_time: datetime | None = None) -> dict:
-        """新增財務日誌（高階功能）"""
+    @staticmethod
+    def _validate_new_log(category_name, amount, actual_type, note, actuall_time):
+        """檢查新增日誌的欄位格式"""
         if not category_name or not isinstance(category_name, str):
             raise ValueError("category_name 必須為非空字串")
         if not isinstance(amount, (int, float)):
@@ -306,7 +1291,11 @@ class FinanceService:
         if actuall_time is not None and not isinstance(actuall_time, datetime):
             raise ValueError("actuall_time 必須為 datetime 或 None")
 
-        cat = self.db.get_category_by_name(category_name)
+    def add_log(self, category_name: str, amount: float, actual_type: Direction | None = None, note: str | None = None, actuall_time: datetime | None = None) -> dict:
+        """新增財務日誌（高階功能）"""
+        self._validate_new_log(category_name, amount, actual_type, note, actuall_time)
+
+        cat = self._get_cached_category(category_name)
         if not cat:
             raise ValueError(f"找不到類別 '{category_name}'")
             
@@ -320,11 +1309,117 @@ class FinanceService:
         )
         return self._log_to_dict(log)
 
+    def add_logs_bulk(self, logs: list[dict], chunk_size: int = 1000) -> dict:
+        """批次新增財務日誌（高階功能）
+
+        每筆先驗證，類別名稱只查詢一次，再以 chunk_size 筆為一個交易批次寫入。
+        單筆或單一批次失敗不會中止整批匯入。
+
+        Args:
+            logs: 字典清單，欄位同 add_log（category_name, amount, actual_type, note, actuall_time）
+            chunk_size: 每個交易寫入的筆數
+        Returns:
+            dict: {"inserted": 成功筆數, "failed": 失敗筆數, "errors": [{"index": 原始序號, "error": 訊息}]}
+        """
+        if not isinstance(chunk_size, int) or chunk_size <= 0:
+            raise ValueError("chunk_size 必須為大於 0 的整數")
+
+        with self._category_lock:
+            categories = {name: (c.id, c.default_type) for name, c in self._load_categories().items()}
+        errors = []
+        pending = []  # (原始序號, 欄位字典)
+
+        for index, entry in enumerate(logs):
+            try:
+                category_name = entry.get("category_name")
+                amount = entry.get("amount")
+                actual_type = entry.get("actual_type")
+                note = entry.get("note")
+                actuall_time = entry.get("actuall_time")
+                self._validate_new_log(category_name, amount, actual_type, note, actuall_time)
+                if category_name not in categories:
+                    raise ValueError(f"找不到類別 '{category_name}'")
+            except (ValueError, AttributeError) as e:
+                errors.append({"index": index, "error": str(e)})
+                continue
+
+            category_id, default_type = categories[category_name]
+            pending.append((index, {
+                "category_id": category_id,
+                "actual_type": actual_type or default_type,
+                "amount": amount,
+                "note": note,
+                "timestamp": actuall_time or datetime.utcnow(),
+            }))
+
+        inserted = 0
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            try:
+                inserted += self.db.create_logs_bulk([row for _, row in chunk])
+            except Exception as e:
+                errors.extend({"index": index, "error": f"寫入失敗: {e}"} for index, _ in chunk)
+
+        errors.sort(key=lambda e: e["index"])
+        return {"inserted": inserted, "failed": len(errors), "errors": errors}
+
     def get_log_by_id(self, log_id: int) -> dict | None:
         """依ID查詢單筆日誌（字典格式）"""
         log = self.db.get_log_by_id(log_id)
         return self._log_to_dict(log) if log else None
 
+    def _build_log_filters(self,
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        note_keyword: str | None = None
+    ) -> dict | None:
+        """將查詢參數轉為 FinanceDB 過濾條件；類別不存在時回傳 None"""
+        filters = {}
+        
+        if category_name:
+            cat = self._get_cached_category(category_name)
+            if not cat:
+                return None
+            filters['category_id'] = cat.id
+
+        if direction:
+            filters['actual_type'] = direction
+        if min_amount is not None:
+            filters['min_amount'] = min_amount
+        if max_amount is not None:
+            filters['max_amount'] = max_amount
+        if start_date:
+            filters['start_date'] = to_naive_utc(start_date)
+        if end_date:
+            filters['end_date'] = to_naive_utc(end_date)
+        if note_keyword:
+            filters['note_keyword'] = note_keyword
+        return filters
+
+    @staticmethod
+    def _encode_cursor(row: dict, sort_by: SortField) -> str:
+        """以 (排序欄位值, id) 產生不透明的分頁游標"""
+        payload = json.dumps([row[sort_by.value], row["id"]], ensure_ascii=False)
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def _decode_cursor(cursor: str, sort_by: SortField) -> tuple:
+        """解析分頁游標為 FinanceDB 可用的 (排序欄位值, id)"""
+        try:
+            value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            if value is not None:
+                if sort_by == SortField.TIMESTAMP:
+                    value = datetime.fromisoformat(value)
+                elif sort_by == SortField.DIRECTION:
+                    value = Direction(value)
+            return value, int(last_id)
+        except Exception:
+            raise ValueError("cursor 格式錯誤")
+
     def get_filtered_and_sorted_logs(self,
         category_name: str | None = None,
         direction: Direction | None = None,
@@ -335,7 +1430,9 @@ class FinanceService:
         note_keyword: str | None = None,
         sort_by: SortField = SortField.TIMESTAMP,
         reverse: bool = True,
-        limit: int | None = None
+        limit: int | None = None,
+        offset: int | None = None,
+        running_balance: bool = False
     ) -> list[dict]:
         """取得過濾並排序後的日誌清單
         
@@ -350,43 +1447,389 @@ class FinanceService:
             sort_by: 排序欄位（預設為時間戳記）
             reverse: 是否降序（預設為是）
             limit: 限制回傳筆數（可選）
+            offset: 略過前 N 筆（可選）
+            running_balance: 附上累計淨額 running_balance（僅支援依時間排序）
         Returns:
             list[dict]: 日誌清單
         """
-        # 準備過濾條件
-        filters = {}
+        filters = self._build_log_filters(category_name, direction, min_amount, max_amount, start_date, end_date, note_keyword)
+        if filters is None:
+            return []
+
+        # 取得排序後的日誌（limit/offset 於 SQL 中套用）並轉換為字典格式
+        return self._fetch_log_dicts(sort_by, reverse, filters, limit, offset, None, running_balance)
+
+    def _fetch_log_dicts(self, sort_by: SortField, reverse: bool, filters: dict, limit: int | None, offset: int | None, after: tuple | None, running_balance: bool) -> list[dict]:
+        """查詢投影日誌並轉為字典；running_balance 時附上累計淨額"""
+        if not running_balance:
+            rows = self.db.get_log_rows_with_sorting(sort_by, reverse, filters, limit=limit, offset=offset, after=after)
+            return [self._row_to_dict(r) for r in rows]
+        if sort_by != SortField.TIMESTAMP:
+            raise ValueError("running_balance 僅支援依 timestamp 排序")
+        result = []
+        for *row, balance in self.db.get_log_rows_with_balance(reverse, filters, limit=limit, offset=offset, after=after):
+            item = self._row_to_dict(tuple(row))
+            # 沒有時間的日誌無法排入帳本順序，累計淨額為 None
+            item["running_balance"] = round(balance, 2) if balance is not None else None
+            result.append(item)
+        return result
+
+    def get_logs_page(self,
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        note_keyword: str | None = None,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        limit: int = 50,
+        cursor: str | None = None,
+        running_balance: bool = False
+    ) -> dict:
+        """以 keyset 分頁取得日誌，成本與前面已翻過的資料量無關
         
+        Args:
+            limit: 每頁筆數
+            cursor: 上一頁回傳的 next_cursor（第一頁不需提供）
+            running_balance: 附上累計淨額（僅支援依時間排序，跨頁連續）
+            其餘參數同 get_filtered_and_sorted_logs
+        Returns:
+            dict: {"items": 日誌清單, "next_cursor": 下一頁游標或 None}
+        """
+        if not isinstance(limit, int) or limit <= 0:
+            raise ValueError("limit 必須為大於 0 的整數")
+        after = self._decode_cursor(cursor, sort_by) if cursor else None
+
+        filters = self._build_log_filters(category_name, direction, min_amount, max_amount, start_date, end_date, note_keyword)
+        if filters is None:
+            return {"items": [], "next_cursor": None}
+
+        # 多取一筆以判斷是否還有下一頁
+        rows = self._fetch_log_dicts(sort_by, reverse, filters, limit + 1, None, after, running_balance)
+        items = rows[:limit]
+        next_cursor = self._encode_cursor(items[-1], sort_by) if len(rows) > limit else None
+        return {"items": items, "next_cursor": next_cursor}
+
+    def export_logs(self,
+        fmt: str = "csv",
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        min_amount: float | None = None,
+        max_amount: float | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        note_keyword: str | None = None,
+        sort_by: SortField = SortField.TIMESTAMP,
+        reverse: bool = True,
+        batch_size: int = 1000
+    ):
+        """匯出日誌為 CSV 或 NDJSON 文字區塊的迭代器
+        
+        過濾條件在呼叫時立即解析；回傳的迭代器才逐批讀取資料，適合直接交給 StreamingResponse。
+        
+        Args:
+            fmt: "csv" 或 "ndjson"
+            batch_size: 每批讀取與輸出的筆數
+            其餘參數同 get_filtered_and_sorted_logs
+        """
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError("fmt 必須為 csv 或 ndjson")
+        filters = self._build_log_filters(category_name, direction, min_amount, max_amount, start_date, end_date, note_keyword)
+        rows = self.db.iter_log_rows(sort_by, reverse, filters, batch_size) if filters is not None else iter(())
+        return self._iter_export_chunks(rows, fmt, batch_size)
+
+    def _iter_export_chunks(self, rows, fmt: str, batch_size: int):
+        """將投影 tuple 逐批格式化為輸出文字"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(["id", "category_id", "category", "actual_type", "amount", "note", "timestamp"])
+
+        pending = 0
+        for row in rows:
+            item = self._row_to_dict(row)
+            if writer:
+                writer.writerow(item.values())
+            else:
+                buffer.write(json.dumps(item, ensure_ascii=False))
+                buffer.write("\n")
+            pending += 1
+            if pending >= batch_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+
+        tail = buffer.getvalue()
+        if tail:
+            yield tail
+
+    def get_balance_curve(self,
+        start_date: date | None = None,
+        end_date: date | None = None,
+        category_name: str | None = None
+    ) -> dict:
+        """每日淨額與累計淨額（累計儲蓄曲線），由 daily_summary 以視窗函數計算
+        
+        Args:
+            start_date: 開始日期（可選，累計值包含之前的所有淨額）
+            end_date: 結束日期（可選）
+            category_name: 只計算此類別（可選）
+        Returns:
+            dict: {"opening_balance": 開始日前的累計淨額, "points": [{"day", "net", "balance"}]}
+        """
+        category_id = None
         if category_name:
-            cat = self.db.get_category_by_name(category_name)
+            cat = self._get_cached_category(category_name)
             if not cat:
-                return []
-            filters['category_id'] = cat.id
+                return {"opening_balance": 0.0, "points": []}
+            category_id = cat.id
+        opening, rows = self.db.get_daily_balance(category_id, start_date, end_date)
+        return {
+            "opening_balance": round(opening, 2),
+            "points": [
+                {"day": day.isoformat(), "net": round(net or 0.0, 2), "balance": round(balance or 0.0, 2)}
+                for day, net, balance in rows
+            ]
+        }
 
-        if direction:
-            filters['actual_type'] = direction
-        if min_amount is not None:
-            filters['min_amount'] = min_amount
-        if max_amount is not None:
-            filters['max_amount'] = max_amount
-        if start_date:
-            filters['start_date'] = start_date
-        if end_date:
-            filters['end_date'] = end_date
-        if note_keyword:
-            filters['note_keyword'] = note_keyword
+    def search_logs(self,
+        query: str,
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        limit: int = 50
+    ) -> list[dict]:
+        """備註全文搜尋，依相關度排序
+        
+        Args:
+            query: 搜尋字串，空白分隔的關鍵字須全部符合，"..." 為片語
+            其餘參數同 get_filtered_and_sorted_logs
+        Returns:
+            list[dict]: 日誌字典加上 score（相關度，越大越相關）
+        """
+        terms = parse_search_terms(query)
+        if not terms:
+            raise ValueError("請提供搜尋關鍵字")
+        filters = self._build_log_filters(category_name, direction, start_date=start_date, end_date=end_date)
+        if filters is None:
+            return []
+        result = []
+        for *row, score in self.db.search_log_rows(terms, filters, limit):
+            item = self._row_to_dict(tuple(row))
+            item["score"] = round(score, 4) if score is not None else None
+            result.append(item)
+        return result
+
+    def get_ledger_view(self, start_date: datetime | None = None, end_date: datetime | None = None) -> LedgerView:
+        """取得欄式快照在 [start_date, end_date] 的零複製切片，供向量化分析使用"""
+        return self.db.get_ledger_view(start_date, end_date)
 
-        # 取得排序後的日誌
-        logs = self.db.get_logs_with_sorting(sort_by, reverse, filters)
+    def get_logs_by_ids(self, log_ids: list[int]) -> list[dict]:
+        """依 ID 批次取得日誌，回傳順序與 log_ids 相同（不存在者略過）"""
+        if not log_ids:
+            return []
+        rows = self.db.get_log_rows_with_sorting(SortField.ID, reverse=False, filters={"ids": list(log_ids)})
+        by_id = {row[0]: self._row_to_dict(row) for row in rows}
+        return [by_id[i] for i in log_ids if i in by_id]
+
+    def summarize_logs(self,
+        group_by: tuple[str, ...] = (),
+        category_name: str | None = None,
+        direction: Direction | None = None,
+        start_date: datetime | None = None,
+        end_date: datetime | None = None
+    ) -> list[dict]:
+        """在資料庫端分組彙總日誌（合計、筆數、平均）
         
-        # 轉換為字典格式
-        result = [self._log_to_dict(l) for l in logs]
+        Args:
+            group_by: 分組欄位，可為 "actual_type"、"category"、"day"
+            其餘參數同 get_filtered_and_sorted_logs
+        Returns:
+            list[dict]: 每組一筆，含分組欄位與 total、count、average
+        """
+        unknown = set(group_by) - set(AGGREGATE_GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"不支援的分組欄位: {unknown}")
+        filters = self._build_log_filters(category_name, direction, start_date=start_date, end_date=end_date)
+        if filters is None:
+            return []
+
+        result = []
+        for row in self.db.get_log_aggregates(tuple(group_by), filters):
+            *keys, total, count, average = row
+            item = {}
+            for name, key in zip(group_by, keys):
+                if isinstance(key, Direction):
+                    key = key.value
+                elif isinstance(key, date):
+                    key = key.isoformat()
+                item[name] = key
+            item.update({"total": total or 0.0, "count": count, "average": average})
+            result.append(item)
+        return result
+
+    def sum_by_direction(self, start_date: datetime | None = None, end_date: datetime | None = None) -> dict:
+        """以欄式快照的時間切片取得區間內收入與支出合計（只查詢資料版本，不掃描日誌）
+
+        快照於第一次讀取時載入；create_log / create_logs_bulk 以增量附加新日誌，
+        update_log、delete_log_by_id、delete_category_by_id 與 rebuild_daily_summary 會使快照失效，下次讀取時重新載入。
+        SQLite 另以觸發器計數 finance_log 的寫入，外部程式新增的日誌會被附加，修改或刪除則使快照重新載入
         
-        # 如果有指定 limit，只回傳前 N 筆
-        if limit is not None and limit > 0:
-            result = result[:limit]
-            
+        Returns:
+            dict: {"Income": 收入合計, "Expenditure": 支出合計}
+        """
+        view = self.get_ledger_view(start_date, end_date)
+        return {
+            d.value: float(view.amounts[view.directions == code].sum())
+            for d, code in DIRECTION_CODES.items()
+        }
+
+    @staticmethod
+    def _bucket_start(day: date, bucket: str) -> date:
+        """取得日期所屬區間的起始日（週以星期一為起點）"""
+        if bucket == "week":
+            return day - timedelta(days=day.weekday())
+        if bucket == "month":
+            return day.replace(day=1)
+        return day
+
+    @staticmethod
+    def _next_bucket(day: date, bucket: str) -> date | None:
+        """下一個區間的起始日；超出 date.max 時回傳 None"""
+        try:
+            if bucket == "week":
+                return day + timedelta(days=7)
+            if bucket == "month":
+                return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+            return day + timedelta(days=1)
+        except OverflowError:
+            return None
+
+    @staticmethod
+    def _count_buckets(first: date, last: date, bucket: str) -> int:
+        """[first, last] 之間的區間數（first 為區間起始日）"""
+        if last < first:
+            return 0
+        if bucket == "week":
+            return (last - first).days // 7 + 1
+        if bucket == "month":
+            return (last.year - first.year) * 12 + last.month - first.month + 1
+        return (last - first).days + 1
+
+    def split_periods(self, start_date: datetime, end_date: datetime, period: str = "month", max_periods: int | None = None) -> list[tuple[datetime, datetime]]:
+        """把 [start_date, end_date] 依日/週/月切成連續區間（頭尾區間可能不完整）
+
+        Returns:
+            list[tuple]: (區間開始, 區間結束) 清單，結束時間為下個區間開始前 1 微秒
+        """
+        if period not in ("day", "week", "month"):
+            raise ValueError("period 必須為 day、week 或 month")
+        if start_date > end_date:
+            raise ValueError("開始時間不可晚於結束時間")
+        periods = []
+        current = start_date
+        while current <= end_date:
+            next_day = self._next_bucket(self._bucket_start(current.date(), period), period)
+            if next_day is None:  # 最後一個區間延伸到 date.max
+                periods.append((current, end_date))
+                break
+            boundary = _day_start(next_day)
+            if current.tzinfo is not None:
+                boundary = boundary.replace(tzinfo=current.tzinfo)
+            periods.append((current, min(end_date, boundary - timedelta(microseconds=1))))
+            if max_periods is not None and len(periods) > max_periods:
+                raise ValueError(f"區間數量超過上限 {max_periods}")
+            current = boundary
+        return periods
+
+    def get_timeseries(self,
+        bucket: str = "day",
+        start_date: datetime | None = None,
+        end_date: datetime | None = None,
+        group_by: str = "direction",
+        max_buckets: int | None = None
+    ) -> dict:
+        """依日/週/月分桶的收支時間序列（空桶補 0），供圖表使用
+        
+        先在資料庫端依 (日期, 分組) 彙總（完整日子讀 daily_summary），再把日期併入區間，
+        資料量只與天數有關。
+        
+        Args:
+            bucket: "day"、"week" 或 "month"
+            start_date: 開始時間（可選，預設為最早一筆資料）
+            end_date: 結束時間（可選，預設為最後一筆資料）
+            group_by: "direction"（依實際方向）或 "category"（依類別）
+            max_buckets: 區間數上限，超過時拋出 ValueError（可選）
+        Returns:
+            dict: {"bucket", "group_by", "buckets": [區間起始日], "series": [{"key", "totals", "counts"}]}
+        """
+        if bucket not in ("day", "week", "month"):
+            raise ValueError("bucket 必須為 day、week 或 month")
+        if group_by not in ("direction", "category"):
+            raise ValueError("group_by 必須為 direction 或 category")
+        key_field = "actual_type" if group_by == "direction" else "category"
+        start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+
+        cache_key = ("timeseries", bucket, start_date, end_date, group_by, self.db.ledger_version)
+        cached = self.report_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        if max_buckets is not None and start_date and end_date:
+            # 先以查詢區間檢查，避免超大範圍時還去讀資料
+            if self._count_buckets(self._bucket_start(start_date.date(), bucket), end_date.date(), bucket) > max_buckets:
+                raise ValueError(f"區間數量超過上限 {max_buckets}")
+
+        rows = [
+            r for r in self.summarize_logs(("day", key_field), start_date=start_date, end_date=end_date)
+            if r["day"] is not None
+        ]
+        days = [date.fromisoformat(r["day"]) for r in rows]
+
+        buckets = []
+        if rows or (start_date and end_date):
+            first = self._bucket_start(start_date.date() if start_date else min(days), bucket)
+            last = end_date.date() if end_date else max(days)
+            if max_buckets is not None and self._count_buckets(first, last, bucket) > max_buckets:
+                raise ValueError(f"區間數量超過上限 {max_buckets}")
+            current = first
+            while current is not None and current <= last:
+                buckets.append(current)
+                current = self._next_bucket(current, bucket)
+        position = {b: i for i, b in enumerate(buckets)}
+
+        series = {}
+        for row, day in zip(rows, days):
+            index = position.get(self._bucket_start(day, bucket))
+            if index is None:
+                continue
+            key = row[key_field]
+            if key not in series:
+                series[key] = {"key": key, "totals": [0.0] * len(buckets), "counts": [0] * len(buckets)}
+            series[key]["totals"][index] += row["total"]
+            series[key]["counts"][index] += row["count"]
+
+        for s in series.values():
+            s["totals"] = [round(t, 2) for t in s["totals"]]
+
+        result = {
+            "bucket": bucket,
+            "group_by": group_by,
+            "buckets": [b.isoformat() for b in buckets],
+            "series": sorted(series.values(), key=lambda s: (s["key"] is None, str(s["key"]))),
+        }
+        self.report_cache.put(cache_key, result)
         return result
 
+    def rebuild_daily_summary(self) -> dict:
+        """從原始日誌重建每日彙總（資料被外部修改後使用）"""
+        rows = self.db.rebuild_daily_summary()
+        return {"status": "success", "rows": rows}
+
     def update_category(self, category_id: int, name: str | None = None, default_type: Direction | None = None) -> dict | None:
         """修改類別（高階功能）"""
         # 基本驗證
@@ -395,9 +1838,14 @@ class FinanceService:
         if default_type is not None and not isinstance(default_type, Direction):
             raise ValueError("default_type 必須為 Direction")
             
+        with self._category_lock:
+            # 取得舊名稱以便更新快取
+            cached = self._load_categories()
+            old_name = next((n for n, c in cached.items() if c.id == category_id), None)
         cat = self.db.update_category(category_id, name, default_type)
         if not cat:
             return None
+        self._apply_category_write(removed=old_name, added=CachedCategory(cat.id, cat.name, cat.default_type))
         return {"id": cat.id, "name": cat.name, "default_type": cat.default_type.value}
 
     def update_log(self,
@@ -414,7 +1862,7 @@ class FinanceService:
         if category_name is not None:
             if not isinstance(category_name, str) or not category_name:
                 raise ValueError("category_name 必須為非空字串")
-            cat = self.db.get_category_by_name(category_name)
+            cat = self._get_cached_category(category_name)
             if not cat:
                 raise ValueError(f"找不到類別 '{category_name}'")
             category_id = cat.id
@@ -0,0 +1,305 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import csv
+import os
+import re
+import threading
+import uuid
+
+from dataBase.FinanceDB import FinanceService, Direction
+
+# 匯入欄位 -> 預設來源欄名（CSV 可透過 mapping 覆寫）
+IMPORT_FIELDS = ("category_name", "amount", "timestamp", "note", "actual_type")
+SUPPORTED_FORMATS = ("csv", "ofx", "qif")
+MAX_JOB_ERRORS = 100  # 每個工作最多保留的錯誤明細筆數
+MAX_FINISHED_JOBS = 50  # 最多保留的已結束工作數
+
+_QIF_DATE_FORMATS = ("%m/%d/%Y", "%m/%d/%y", "%m/%d'%y", "%Y-%m-%d", "%d/%m/%Y")
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def _parse_amount(value) -> float:
+    """解析金額字串（允許千分位逗號）"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "").strip().replace(",", "")
+    if not text:
+        raise ValueError("缺少金額")
+    try:
+        return float(text)
+    except ValueError:
+        raise ValueError(f"金額格式錯誤: {value}")
+
+
+def _parse_time(value: str | None, date_format: str | None = None, fallbacks: tuple = ()) -> datetime | None:
+    """解析時間字串；未提供時回傳 None（由 Service 帶入目前時間）"""
+    text = (value or "").strip()
+    if not text:
+        return None
+    if date_format:
+        return datetime.strptime(text, date_format)
+    try:
+        return datetime.fromisoformat(text.replace("/", "-"))
+    except ValueError:
+        pass
+    for fmt in fallbacks:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"時間格式錯誤: {value}")
+
+
+def _parse_ofx_time(value: str | None, date_format: str | None = None) -> datetime | None:
+    """解析 OFX 時間（YYYYMMDD[HHMMSS[.XXX]][[時區]]，時區資訊忽略）"""
+    text = (value or "").strip()
+    if date_format or not text:
+        return _parse_time(text, date_format)
+    digits = text.split("[")[0].split(".")[0]
+    return datetime.strptime(digits[:14], "%Y%m%d%H%M%S") if len(digits) >= 14 else datetime.strptime(digits[:8], "%Y%m%d")
+
+
+def _signed_entry(category_name, amount: float, actual_type: Direction | None, note, timestamp) -> dict:
+    """組成 add_logs_bulk 的欄位；負數金額視為支出並取絕對值"""
+    if amount < 0:
+        amount = -amount
+        actual_type = actual_type or Direction.Expenditure
+    return {
+        "category_name": category_name,
+        "amount": amount,
+        "actual_type": actual_type,
+        "note": note or None,
+        "actuall_time": timestamp,
+    }
+
+
+def iter_csv_records(stream, mapping: dict | None = None, default_category: str | None = None, date_format: str | None = None):
+    """逐列解析 CSV，產生 (列號, 欄位字典或 ValueError)
+
+    Args:
+        stream: 文字串流
+        mapping: 匯入欄位 -> CSV 欄名，未指定者使用同名欄位
+        default_category: 找不到類別欄位時使用的類別
+        date_format: strptime 格式（未提供時使用 ISO 8601）
+    """
+    columns = {field: field for field in IMPORT_FIELDS}
+    columns.update(mapping or {})
+    reader = csv.DictReader(stream)
+    for row_no, row in enumerate(reader, start=2):  # 第 1 列為標題
+        try:
+            direction = (row.get(columns["actual_type"]) or "").strip()
+            yield row_no, _signed_entry(
+                (row.get(columns["category_name"]) or "").strip() or default_category,
+                _parse_amount(row.get(columns["amount"])),
+                Direction(direction) if direction else None,
+                row.get(columns["note"]),
+                _parse_time(row.get(columns["timestamp"]), date_format),
+            )
+        except ValueError as e:
+            yield row_no, e
+
+
+def iter_ofx_records(stream, default_category: str | None = None, date_format: str | None = None):
+    """逐筆解析 OFX 的 <STMTTRN> 區塊（正數為收入、負數為支出）"""
+    block = None
+    record_no = 0
+    for line in stream:
+        upper = line.upper()
+        if "<STMTTRN>" in upper:
+            block = {}
+            line = line[upper.index("<STMTTRN>") + len("<STMTTRN>"):]
+        if block is None:
+            continue
+        for tag, value in _OFX_TAG.findall(line):
+            block[tag.upper()] = value.strip()
+        if "</STMTTRN>" in upper:
+            record_no += 1
+            try:
+                amount = _parse_amount(block.get("TRNAMT"))
+                timestamp = _parse_ofx_time(block.get("DTPOSTED"), date_format)
+                note = " ".join(v for v in (block.get("NAME"), block.get("MEMO")) if v)
+                yield record_no, _signed_entry(
+                    default_category,
+                    amount,
+                    Direction.Income if amount > 0 else None,
+                    note,
+                    timestamp,
+                )
+            except ValueError as e:
+                yield record_no, e
+            block = None
+
+
+def iter_qif_records(stream, default_category: str | None = None, date_format: str | None = None):
+    """逐筆解析 QIF（以 ^ 結束一筆，L 欄為類別，正數為收入、負數為支出）"""
+    fields = {}
+    record_no = 0
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if not line or line.startswith("!"):
+            continue
+        code, value = line[0], line[1:].strip()
+        if code != "^":
+            fields.setdefault(code, value)
+            continue
+        record_no += 1
+        try:
+            amount = _parse_amount(fields.get("T") or fields.get("U"))
+            note = " ".join(v for v in (fields.get("P"), fields.get("M")) if v)
+            yield record_no, _signed_entry(
+                fields.get("L") or default_category,
+                amount,
+                Direction.Income if amount > 0 else None,
+                note,
+                _parse_time(fields.get("D"), date_format, _QIF_DATE_FORMATS),
+            )
+        except ValueError as e:
+            yield record_no, e
+        fields = {}
+
+
+class StatementImporter:
+    """銀行對帳單匯入：背景串流解析檔案，分批寫入並以工作 ID 回報進度"""
+    def __init__(self, max_workers: int = 1, chunk_size: int = 1000):
+        """
+        Args:
+            max_workers: 同時執行的匯入工作數
+            chunk_size: 每個交易寫入的筆數
+        """
+        self.chunk_size = chunk_size
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="finance-import")
+
+    def close(self):
+        """停止接受新工作"""
+        self._executor.shutdown(wait=False)
+
+    def submit(self,
+        service: FinanceService,
+        path: str,
+        fmt: str = "csv",
+        mapping: dict | None = None,
+        default_category: str | None = None,
+        date_format: str | None = None,
+        encoding: str = "utf-8-sig",
+        filename: str | None = None,
+        delete_after: bool = True
+    ) -> dict:
+        """建立匯入工作並於背景執行
+
+        Args:
+            service: 寫入用的 FinanceService
+            path: 待匯入檔案路徑
+            fmt: "csv"、"ofx" 或 "qif"
+            mapping: CSV 欄位對應（匯入欄位 -> CSV 欄名）
+            default_category: 檔案未提供類別時使用的類別名稱
+            date_format: 時間的 strptime 格式（可選）
+            encoding: 檔案編碼
+            filename: 原始檔名（僅供顯示）
+            delete_after: 匯入完成後刪除檔案
+        Returns:
+            dict: 工作狀態
+        """
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"不支援的格式: {fmt}")
+        unknown = set(mapping or {}) - set(IMPORT_FIELDS)
+        if unknown:
+            raise ValueError(f"不支援的欄位對應: {unknown}")
+
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "pending",
+            "format": fmt,
+            "filename": filename or os.path.basename(path),
+            "processed": 0,
+            "inserted": 0,
+            "failed": 0,
+            "errors": [],
+            "message": None,
+            "created_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._prune_finished()
+            self._jobs[job_id] = job
+        self._executor.submit(self._run, job_id, service, path, fmt, mapping, default_category, date_format, encoding, delete_after)
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> dict | None:
+        """取得工作狀態快照"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {**job, "errors": list(job["errors"])} if job else None
+
+    def list_jobs(self) -> list[dict]:
+        """取得所有工作狀態（不含錯誤明細）"""
+        with self._lock:
+            return [{k: v for k, v in job.items() if k != "errors"} for job in self._jobs.values()]
+
+    def _prune_finished(self):
+        """移除最舊的已結束工作（呼叫端需持有鎖）"""
+        finished = [k for k, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS + 1)]:
+            del self._jobs[job_id]
+
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            self._jobs[job_id].update(changes)
+
+    def _record(self, job_id: str, processed: int, inserted: int, errors: list[dict]):
+        """累加一批的處理結果"""
+        with self._lock:
+            job = self._jobs[job_id]
+            job["processed"] += processed
+            job["inserted"] += inserted
+            job["failed"] += len(errors)
+            room = MAX_JOB_ERRORS - len(job["errors"])
+            if room > 0:
+                job["errors"].extend(errors[:room])
+
+    def _run(self, job_id, service, path, fmt, mapping, default_category, date_format, encoding, delete_after):
+        self._update(job_id, status="running", started_at=datetime.utcnow().isoformat())
+        try:
+            with open(path, "r", encoding=encoding, newline="") as stream:
+                if fmt == "csv":
+                    records = iter_csv_records(stream, mapping, default_category, date_format)
+                elif fmt == "ofx":
+                    records = iter_ofx_records(stream, default_category, date_format)
+                else:
+                    records = iter_qif_records(stream, default_category, date_format)
+
+                chunk, row_numbers, errors = [], [], []
+                for row_no, entry in records:
+                    if isinstance(entry, ValueError):
+                        errors.append({"row": row_no, "error": str(entry)})
+                    else:
+                        chunk.append(entry)
+                        row_numbers.append(row_no)
+                    if len(chunk) + len(errors) >= self.chunk_size:
+                        self._flush(job_id, service, chunk, row_numbers, errors)
+                        chunk, row_numbers, errors = [], [], []
+                self._flush(job_id, service, chunk, row_numbers, errors)
+            self._update(job_id, status="done", finished_at=datetime.utcnow().isoformat())
+        except Exception as e:
+            self._update(job_id, status="failed", message=str(e), finished_at=datetime.utcnow().isoformat())
+        finally:
+            service.db.remove_session()
+            if delete_after:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _flush(self, job_id, service: FinanceService, chunk: list[dict], row_numbers: list[int], parse_errors: list[dict]):
+        """寫入一批資料並更新進度"""
+        inserted = 0
+        errors = list(parse_errors)
+        if chunk:
+            result = service.add_logs_bulk(chunk, chunk_size=self.chunk_size)
+            inserted = result["inserted"]
+            errors.extend({"row": row_numbers[e["index"]], "error": e["error"]} for e in result["errors"])
+            errors.sort(key=lambda e: e["row"])
+        self._record(job_id, len(chunk) + len(parse_errors), inserted, errors)
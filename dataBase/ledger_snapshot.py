@@ -0,0 +1,165 @@
+from datetime import datetime, timezone
+import threading
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+# 欄位名稱 -> 型別（loader 回傳的陣列需包含這些欄位）
+SNAPSHOT_COLUMNS = {
+    "id": np.int64,
+    "timestamp": "datetime64[us]",
+    "amount": np.float64,
+    "category_id": np.int32,   # 無類別為 -1
+    "direction": np.int8,      # 見 FinanceDB.DIRECTION_CODES，無方向為 -1
+}
+_INITIAL_CAPACITY = 1024
+
+
+class LedgerVersion(NamedTuple):
+    """finance_log 的資料版本：新增只需附加到快照尾端，修改或刪除則需整份重新載入"""
+    inserted: int
+    changed: int | None  # None 表示無法偵測（修改/刪除由寫入方法直接呼叫 invalidate）
+
+
+class LedgerView(NamedTuple):
+    """快照在某時間區間的唯讀切片（與快照共用記憶體，不複製）"""
+    ids: np.ndarray
+    timestamps: np.ndarray
+    amounts: np.ndarray
+    category_ids: np.ndarray
+    directions: np.ndarray
+
+    @property
+    def size(self) -> int:
+        return int(self.ids.size)
+
+    def between(self, start: datetime | None = None, end: datetime | None = None) -> "LedgerView":
+        """以二分搜尋取得 [start, end] 的子切片（不複製）"""
+        lo = int(np.searchsorted(self.timestamps, _to_datetime64(start), side="left")) if start else 0
+        hi = int(np.searchsorted(self.timestamps, _to_datetime64(end), side="right")) if end else self.size
+        return LedgerView(*(column[lo:hi] for column in self))
+
+
+def to_naive_utc(value: datetime | None) -> datetime | None:
+    """資料庫存的是不含時區的 UTC 時間；含時區的時間先轉為 UTC 再去掉時區"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _to_datetime64(value: datetime) -> np.datetime64:
+    return np.datetime64(to_naive_utc(value), "us")
+
+
+class LedgerSnapshot:
+    """finance_log 的欄式記憶體快照（執行緒安全）
+
+    依 (timestamp, id) 排序，時間區間查詢以二分搜尋取得零複製切片。
+    每次讀取時比對 LedgerVersion：新增版本改變時只讀取新的資料列附加到尾端，
+    修改版本改變（或呼叫 invalidate()）時整份重新載入；版本由資料庫觸發器計數時也涵蓋外部程式的寫入。
+    已交出的切片永遠不會被就地修改：附加只寫入切片範圍之外，重新排序或載入時改用新陣列。
+    """
+    def __init__(self, loader: Callable[[int | None], dict]):
+        """
+        Args:
+            loader: loader(min_id) 回傳 id >= min_id（None 表示全部）的欄位陣列字典，
+                    欄位同 SNAPSHOT_COLUMNS 並依 (timestamp, id) 排序
+        """
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._columns: dict[str, np.ndarray] = {}
+        self._size = 0
+        self._max_id = 0
+        self._version: LedgerVersion | None = None  # 快照對應的資料版本；None 表示尚未載入或已失效
+        self._sorted = True
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None
+
+    def invalidate(self):
+        """標記快照失效（日誌被修改或刪除時呼叫）"""
+        with self._lock:
+            self._version = None
+
+    def extend(self, version: LedgerVersion):
+        """依版本附加新日誌或重新載入（新增日誌後呼叫；尚未載入時略過）"""
+        with self._lock:
+            if self._version is None:
+                return
+            try:
+                self._sync(version)
+            except Exception:
+                self._version = None  # 寫入已成功，快照改在下次讀取時重新載入
+
+    def view(self, version: LedgerVersion, start: datetime | None = None, end: datetime | None = None) -> LedgerView:
+        """取得 [start, end] 區間的切片，必要時先載入或補上新資料
+
+        Args:
+            version: 目前的資料版本（FinanceDB.get_log_version()，需在讀取資料前取得）
+            start: 起始時間（含，可選）
+            end: 結束時間（含，可選）
+        """
+        with self._lock:
+            self._sync(version)
+            if not self._sorted:
+                self._sort()
+            view = LedgerView(*(self._columns[name][:self._size] for name in SNAPSHOT_COLUMNS))
+        return view.between(start, end)
+
+    def stats(self) -> dict:
+        """快照大小與狀態"""
+        with self._lock:
+            return {
+                "rows": self._size,
+                "version": self._version._asdict() if self._version else None,
+                "bytes": sum(column[:self._size].nbytes for column in self._columns.values()),
+            }
+
+    # 以下方法呼叫端需持有 _lock
+    def _sync(self, version: LedgerVersion):
+        if self._version is None or self._version.changed != version.changed:
+            self._load(version)
+        elif self._version.inserted != version.inserted:
+            self._append_tail(version)
+
+    def _load(self, version: LedgerVersion):
+        data = self._loader(None)
+        self._columns = {name: np.asarray(data[name], dtype=dtype) for name, dtype in SNAPSHOT_COLUMNS.items()}
+        self._size = int(self._columns["id"].size)
+        self._max_id = int(self._columns["id"].max()) if self._size else 0
+        self._sorted = True
+        self._version = version
+
+    def _append_tail(self, version: LedgerVersion):
+        data = self._loader(self._max_id + 1)
+        count = len(data["id"])
+        if count:
+            self._reserve(self._size + count)
+            end = self._size + count
+            for name, dtype in SNAPSHOT_COLUMNS.items():
+                self._columns[name][self._size:end] = np.asarray(data[name], dtype=dtype)
+            timestamps = self._columns["timestamp"]
+            # 補登過去日期的資料會打亂時間順序，延後到下次讀取時再排序
+            if self._size and timestamps[self._size] < timestamps[self._size - 1]:
+                self._sorted = False
+            self._size = end
+            self._max_id = max(self._max_id, int(self._columns["id"][self._size - count:self._size].max()))
+        self._version = version
+
+    def _reserve(self, capacity: int):
+        """容量不足時以倍增配置新陣列（舊陣列留給已交出的切片）"""
+        current = self._columns["id"].size if self._columns else 0
+        if capacity <= current:
+            return
+        new_capacity = max(_INITIAL_CAPACITY, current * 2, capacity)
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            grown = np.empty(new_capacity, dtype=dtype)
+            if name in self._columns:
+                grown[:self._size] = self._columns[name][:self._size]
+            self._columns[name] = grown
+
+    def _sort(self):
+        order = np.lexsort((self._columns["id"][:self._size], self._columns["timestamp"][:self._size]))
+        self._columns = {name: column[:self._size][order] for name, column in self._columns.items()}
+        self._sorted = True
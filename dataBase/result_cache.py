@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+_MISSING = object()
+
+class ResultCache:
+    """有大小上限與存活時間的 LRU 結果快取（執行緒安全）
+
+    鍵值應包含帳本版本號 (FinanceDB.ledger_version)，寫入後舊結果自然不會再被命中。
+    取出的結果為深複製，呼叫端可自由修改。
+    """
+    def __init__(self, max_entries: int = 128, ttl: float = 300.0):
+        """
+        Args:
+            max_entries: 最多保留的結果數，超過時淘汰最久未使用者（0 表示停用快取）
+            ttl: 結果存活秒數
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()  # key -> (到期時間, 結果)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        """取得快取結果；不存在或已過期時回傳 default"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                    self._evictions += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        """寫入結果並淘汰超出上限的項目"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """命中則回傳快取結果，否則呼叫 compute() 計算並寫入"""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """清除所有結果"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """命中/未命中統計"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,103 @@
+import math
+import numpy as np
+
+FORECAST_METHODS = ("ewma", "trend", "seasonal")
+EWMA_ALPHA = 0.3
+MIN_HISTORY_DAYS = 14  # 區間內已過天數不足時，往前補足的歷史天數
+SEASONAL_LAG_DAYS = 364  # 去年同期以 52 週對齊，保留星期幾的週期
+
+
+def daily_matrix(rows, first_day, n_days: int, keys: tuple) -> np.ndarray:
+    """把 summarize_logs(("day", key)) 的結果攤平成 (len(keys), n_days) 的每日合計矩陣
+
+    Args:
+        rows: summarize_logs 回傳的字典清單（day 為 ISO 日期字串）
+        first_day: 第 0 欄對應的日期
+        n_days: 天數
+        keys: 各列對應的分組值（如 ("Income", "Expenditure")）
+    """
+    matrix = np.zeros((len(keys), n_days))
+    position = {k: i for i, k in enumerate(keys)}
+    rows = [r for r in rows if r["day"] is not None and r["actual_type"] in position]
+    if not rows:
+        return matrix
+    offsets = np.array([(np.datetime64(r["day"]) - np.datetime64(first_day)).astype(int) for r in rows])
+    series = np.array([position[r["actual_type"]] for r in rows])
+    totals = np.array([r["total"] for r in rows], dtype=float)
+    inside = (offsets >= 0) & (offsets < n_days)
+    np.add.at(matrix, (series[inside], offsets[inside]), totals[inside])
+    return matrix
+
+
+def ewma_level(history: np.ndarray, alpha: float = EWMA_ALPHA) -> np.ndarray:
+    """各列的指數加權平均（最近一天權重最大），history 形狀為 (列數, 天數)"""
+    n = history.shape[1]
+    if n == 0:
+        return np.zeros(history.shape[0])
+    weights = (1 - alpha) ** np.arange(n - 1, -1, -1)
+    return history @ weights / weights.sum()
+
+
+def linear_trend(history: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """各列以最小平方法擬合 y = a + b*t，回傳 (a, b)（t 為 0..天數-1）"""
+    n = history.shape[1]
+    if n < 2:
+        return ewma_level(history), np.zeros(history.shape[0])
+    t = np.arange(n, dtype=float)
+    t_centered = t - t.mean()
+    slope = (history - history.mean(axis=1, keepdims=True)) @ t_centered / (t_centered @ t_centered)
+    intercept = history.mean(axis=1) - slope * t.mean()
+    return intercept, slope
+
+
+def project_remaining(history: np.ndarray, remaining_days: int, method: str = "ewma",
+                      observed: np.ndarray | None = None,
+                      last_year_observed: np.ndarray | None = None,
+                      last_year_remaining: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """預測剩餘天數的各列合計與標準差
+
+    Args:
+        history: (列數, 天數) 的每日合計，最後一欄為最近的完整日
+        remaining_days: 剩餘天數
+        method: "ewma"、"trend" 或 "seasonal"
+        observed: 本期已發生的各列合計（seasonal 用於計算與去年的比例）
+        last_year_observed: 去年同期已發生部分的各列合計（seasonal）
+        last_year_remaining: 去年同期剩餘部分的各列合計（seasonal）
+    Returns:
+        tuple: (預測合計, 標準差)，形狀皆為 (列數,)
+    """
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"不支援的預測方法: {method}")
+    rows = history.shape[0]
+    if remaining_days <= 0:
+        return np.zeros(rows), np.zeros(rows)
+
+    n = history.shape[1]
+    if method == "trend":
+        intercept, slope = linear_trend(history)
+        future_t = np.arange(n, n + remaining_days, dtype=float)
+        # 每日預測值不低於 0
+        daily = np.maximum(intercept[:, None] + slope[:, None] * future_t, 0.0)
+        projected = daily.sum(axis=1)
+        fitted = intercept[:, None] + slope[:, None] * np.arange(n, dtype=float)
+    else:
+        level = ewma_level(history)
+        projected = level * remaining_days
+        fitted = level[:, None]
+        if method == "seasonal" and last_year_remaining is not None and last_year_observed is not None:
+            # 依本期與去年同期已發生部分的比例縮放去年的剩餘部分；去年無資料的列維持 EWMA
+            has_base = last_year_observed > 0
+            ratio = np.divide(observed, last_year_observed, out=np.ones(rows), where=has_base)
+            seasonal = ratio * last_year_remaining
+            projected = np.where(last_year_remaining > 0, seasonal, projected)
+
+    # 以歷史殘差估計每日波動，視各日獨立：剩餘合計的標準差 = sqrt(天數) * 每日標準差
+    residual_std = np.sqrt(((history - fitted) ** 2).mean(axis=1)) if n else np.zeros(rows)
+    return projected, residual_std * math.sqrt(remaining_days)
+
+
+def probability_at_least(target: float, mean: float, std: float) -> float:
+    """常態近似下 P(X >= target)"""
+    if std <= 0:
+        return 1.0 if mean >= target else 0.0
+    return 0.5 * math.erfc((target - mean) / (std * math.sqrt(2)))
@@ -1,7 +1,10 @@
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
+import numpy as np
 from dataBase.FinanceDB import Direction , FinanceService
+from dataBase.ledger_snapshot import to_naive_utc
+from goal.forecast import FORECAST_METHODS, MIN_HISTORY_DAYS, SEASONAL_LAG_DAYS, daily_matrix, project_remaining, probability_at_least
 
 REQUIRED_KEYS = {"income", "expenditure", "total_save"}
 
@@ -42,22 +45,11 @@ def update_goal_data(path, goal_data:tuple):
     print(f"資料寫入 (Income: {goal_data[0]}, Exp: {goal_data[1]}, Save: {goal_data[2]})")
 
 def calculate_period_stats(service:FinanceService, start_date: datetime, end_date: datetime):
-    logs = service.get_filtered_and_sorted_logs(
-        start_date=start_date,
-        end_date=end_date
-    )
-
-    actual_income = 0.0
-    actual_expenditure = 0.0
+    # 由欄式快照的時間切片加總取得收支合計，不逐筆建立日誌物件
+    totals = service.sum_by_direction(start_date, end_date)
 
-    for log in logs:
-        amount = log['amount']
-        l_type = log['actual_type']
-
-        if l_type == Direction.Income.value:
-            actual_income += amount
-        elif l_type == Direction.Expenditure.value:
-            actual_expenditure += amount
+    actual_income = totals[Direction.Income.value]
+    actual_expenditure = totals[Direction.Expenditure.value]
     
     actual_save = actual_income - actual_expenditure
 
@@ -73,6 +65,12 @@ def generate_goal_report(service, goal_json_path, start_date: datetime, end_date
     except Exception as e:
         return {"error": f"讀取目標檔失敗: {e}"}
 
+    # 依 (目標內容, 區間, 帳本版本) 快取，目標檔或帳本變動後自動失效
+    cache_key = ("goal_report", (goal_inc, goal_exp, goal_save), start_date, end_date, service.db.ledger_version)
+    cached = service.report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     actuals = calculate_period_stats(service, start_date, end_date)
     act_inc = actuals['income']
     act_exp = actuals['expenditure']
@@ -114,4 +112,100 @@ def generate_goal_report(service, goal_json_path, start_date: datetime, end_date
         }
     }
 
-    return report
\ No newline at end of file
+    service.report_cache.put(cache_key, report)
+    return report
+
+def generate_goal_forecast(service, goal_json_path, start_date: datetime, end_date: datetime, method: str = "ewma", as_of: datetime | None = None):
+    """預測區間結束時的收入、支出與儲蓄，並估計達成各目標的機率
+
+    以 daily_summary 的每日合計（numpy 向量化）擬合：
+    ewma 為指數加權平均，trend 為線性趨勢，seasonal 以去年同期（52 週前）的剩餘部分依今年比例縮放。
+    """
+    if method not in FORECAST_METHODS:
+        return {"error": f"不支援的預測方法: {method}"}
+    try:
+        goal_inc, goal_exp, goal_save = read_goal_data(goal_json_path)
+    except Exception as e:
+        return {"error": f"讀取目標檔失敗: {e}"}
+
+    # 帳本時間為不含時區的 UTC；API 傳入的含時區時間先統一，避免與 naive 時間比較時出錯
+    start_date, end_date = to_naive_utc(start_date), to_naive_utc(end_date)
+    as_of = min(to_naive_utc(as_of) or datetime.utcnow(), end_date)
+    cache_key = ("goal_forecast", (goal_inc, goal_exp, goal_save), start_date, end_date, method,
+                 as_of.date(), service.db.ledger_version)
+    cached = service.report_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    keys = (Direction.Income.value, Direction.Expenditure.value)
+    start_day, end_day, today = start_date.date(), end_date.date(), as_of.date()
+    elapsed_days = max((today - start_day).days, 0)  # 已完整經過的天數（不含今天）
+    # 剩餘天數從明天（或尚未開始時從區間第一天）算起
+    last_observed_day = max(today, start_day - timedelta(days=1))
+    remaining_days = (end_day - last_observed_day).days if as_of < end_date else 0
+
+    # 擬合用的歷史：區間內已完整經過的日子，不足時往前補足
+    history_start = min(start_day, today - timedelta(days=MIN_HISTORY_DAYS))
+    history_days = (today - history_start).days
+    rows = service.summarize_logs(
+        ("day", "actual_type"),
+        start_date=datetime.combine(history_start, datetime.min.time()),
+        end_date=datetime.combine(today, datetime.min.time()) - timedelta(microseconds=1)
+    )
+    history = daily_matrix(rows, history_start, history_days, keys)
+
+    actuals = calculate_period_stats(service, start_date, as_of)
+    observed = np.array([actuals["income"], actuals["expenditure"]])
+
+    last_year_observed = last_year_remaining = None
+    if method == "seasonal":
+        lag = timedelta(days=SEASONAL_LAG_DAYS)
+        ly_start, ly_split, ly_end = start_day - lag, last_observed_day - lag, end_day - lag
+        ly_rows = service.summarize_logs(
+            ("day", "actual_type"),
+            start_date=datetime.combine(ly_start, datetime.min.time()),
+            end_date=datetime.combine(ly_end, datetime.max.time())
+        )
+        last_year = daily_matrix(ly_rows, ly_start, (ly_end - ly_start).days + 1, keys)
+        split = (ly_split - ly_start).days
+        last_year_observed = last_year[:, :split + 1].sum(axis=1)
+        last_year_remaining = last_year[:, split + 1:].sum(axis=1)
+
+    projected_rest, std = project_remaining(
+        history, remaining_days, method, observed, last_year_observed, last_year_remaining
+    )
+    projected = observed + projected_rest
+
+    def forecast_metrics(goal, actual, expected, sd, is_expenditure=False):
+        if is_expenditure:
+            probability = 1.0 - probability_at_least(goal, expected, sd)
+        else:
+            probability = probability_at_least(goal, expected, sd)
+        return {
+            "goal": goal,
+            "actual": actual,
+            "projected": round(float(expected), 2),
+            "projected_range": [round(float(expected - 1.96 * sd), 2), round(float(expected + 1.96 * sd), 2)],
+            "probability": round(probability, 4)
+        }
+
+    # 儲蓄 = 收入 - 支出，視兩者獨立
+    save_std = float(np.hypot(std[0], std[1]))
+    report = {
+        "period": {
+            "start": start_date.strftime("%Y-%m-%d"),
+            "end": end_date.strftime("%Y-%m-%d")
+        },
+        "as_of": as_of.isoformat(),
+        "method": method,
+        "days_elapsed": elapsed_days,
+        "days_remaining": remaining_days,
+        "details": {
+            "income": forecast_metrics(goal_inc, actuals["income"], projected[0], std[0]),
+            "expenditure": forecast_metrics(goal_exp, actuals["expenditure"], projected[1], std[1], is_expenditure=True),
+            "total_save": forecast_metrics(goal_save, actuals["total_save"], projected[0] - projected[1], save_std)
+        }
+    }
+
+    service.report_cache.put(cache_key, report)
+    return report
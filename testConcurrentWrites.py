@@ -0,0 +1,123 @@
+"""並行修改/刪除日誌後，檢查 daily_summary 彙總仍與 finance_log 一致
+
+用法: python testConcurrentWrites.py [執行緒數] [每執行緒操作數]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from dataBase.FinanceDB import FinanceDB, FinanceService, Direction
+
+
+def _rollup_mismatches(db: FinanceDB) -> list[tuple]:
+    """比對每日彙總與原始日誌逐日逐類別的合計與筆數，回傳不一致的列"""
+    with db.engine.connect() as conn:
+        raw = {
+            (str(day), category_id, actual_type): (round(total, 2), count)
+            for day, category_id, actual_type, total, count in conn.execute(text(
+                "SELECT date(timestamp), category_id, actual_type, SUM(amount), COUNT(*) FROM finance_log "
+                "WHERE timestamp IS NOT NULL GROUP BY 1, 2, 3"
+            ))
+        }
+        rollup = {
+            (str(day), category_id, actual_type): (round(total, 2), count)
+            for day, category_id, actual_type, total, count in conn.execute(text(
+                "SELECT day, category_id, actual_type, total, count FROM daily_summary WHERE count > 0"
+            ))
+        }
+    return [(key, raw.get(key), rollup.get(key)) for key in sorted(raw.keys() | rollup.keys()) if raw.get(key) != rollup.get(key)]
+
+
+def check_same_row_race(rounds: int = 50) -> list[tuple]:
+    """兩個執行緒同時把同一筆日誌移到不同日期（或一個刪除），彙總不可重複計入"""
+    path = os.path.join(tempfile.mkdtemp(), "race.db")
+    db = FinanceDB(db_url=f"sqlite:///{path}")
+    service = FinanceService(db)
+    service.add_category("餐費", Direction.Expenditure)
+    start = datetime(2024, 1, 1, 12)
+    errors = []
+
+    for i in range(rounds):
+        log_id = service.add_log("餐費", 10, actuall_time=start)["id"]
+        barrier = threading.Barrier(2)
+
+        def move(day: int, delete: bool = False):
+            barrier.wait()
+            try:
+                if delete:
+                    service.delete_log(log_id)
+                else:
+                    service.update_log(log_id, timestamp=start + timedelta(days=day))
+            except Exception as e:
+                errors.append(repr(e))
+            finally:
+                db.remove_session()
+
+        threads = [threading.Thread(target=move, args=(4,)),
+                   threading.Thread(target=move, args=(8, i % 2 == 1))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    mismatches = _rollup_mismatches(db)
+    db.engine.dispose()
+    return mismatches + [("error", e, None) for e in errors]
+
+
+def check_random_writers(writers: int, ops: int) -> list[tuple]:
+    """多個執行緒隨機新增、修改、刪除日誌"""
+    path = os.path.join(tempfile.mkdtemp(), "stress.db")
+    db = FinanceDB(db_url=f"sqlite:///{path}")
+    service = FinanceService(db)
+    service.add_category("餐費", Direction.Expenditure)
+    service.add_category("薪水", Direction.Income)
+    start = datetime(2024, 1, 1)
+    ids = [service.add_log("薪水", 1, actuall_time=start + timedelta(days=i % 10))["id"] for i in range(20)]
+    errors = []
+
+    def work(seed: int):
+        rng = random.Random(seed)
+        try:
+            for _ in range(ops):
+                op = rng.random()
+                day = start + timedelta(days=rng.randint(0, 9), hours=rng.randint(0, 23))
+                if op < 0.3:
+                    service.add_log(rng.choice(("餐費", "薪水")), rng.randint(1, 20), actuall_time=day)
+                elif op < 0.8:
+                    service.update_log(rng.choice(ids), amount=rng.randint(1, 20), timestamp=day,
+                                       category_name=rng.choice(("餐費", "薪水")))
+                else:
+                    service.delete_log(rng.choice(ids))
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            db.remove_session()
+
+    threads = [threading.Thread(target=work, args=(seed,)) for seed in range(writers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    mismatches = _rollup_mismatches(db)
+    db.engine.dispose()
+    return mismatches + [("error", e, None) for e in errors]
+
+
+if __name__ == "__main__":
+    writers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    failed = False
+    for name, mismatches in (("同一筆並行修改/刪除", check_same_row_race()),
+                             (f"{writers} 個執行緒隨機寫入", check_random_writers(writers, ops))):
+        print(f"{name}: {'OK' if not mismatches else f'{len(mismatches)} 筆不一致'}")
+        for key, raw, rollup in mismatches[:10]:
+            print(f"  {key}: 原始 {raw} / 彙總 {rollup}")
+        failed = failed or bool(mismatches)
+    sys.exit(1 if failed else 0)